@@ -0,0 +1,183 @@
+import shlex
+
+from .util import filter_path
+
+
+def translate_path(path, path_mappings):
+    """
+    Translates {path} using the first, longest, matching prefix in
+    {path_mappings}, a dict of from => to paths. Paths not matching any
+    prefix are returned unchanged.
+    """
+    for from_path in sorted(path_mappings, key=len, reverse=True):
+        to_path = path_mappings[from_path]
+        if path == from_path:
+            return to_path
+
+        prefix = from_path.rstrip('/\\')
+        if path.startswith(prefix) and path[len(prefix):len(prefix) + 1] in ('/', '\\'):
+            return to_path.rstrip('/\\') + path[len(prefix):].replace('\\', '/')
+
+    return path
+
+
+def translate_paths_in_text(text, path_mappings):
+    """Replaces all {path_mappings} prefixes in {text}."""
+    for from_path in sorted(path_mappings, key=len, reverse=True):
+        text = text.replace(from_path.rstrip('/\\') + '/', path_mappings[from_path].rstrip('/\\') + '/')
+
+    return text
+
+
+class PathTranslator():
+    """
+    Translates {path_mappings} prefixes in streamed output. Output arrives in
+    arbitrary chunks, so the trailing partial line is held back while it ends
+    with what could be the start of a path to translate. Anything else, e.g.
+    PHPUnit progress output, is passed through without waiting for a newline.
+    """
+
+    def __init__(self, path_mappings):
+        self.path_mappings = path_mappings
+        self._prefixes = [from_path.rstrip('/\\') + '/' for from_path in path_mappings]
+        self._max_prefix_length = max([len(prefix) for prefix in self._prefixes] or [0])
+        self._pending = ''
+
+    def feed(self, text):
+        """Returns the translated text that is safe to output."""
+        text = self._pending + text
+        self._pending = ''
+
+        # Only a tail no longer than the longest prefix can be incomplete.
+        start = max(text.rfind('\n') + 1, len(text) - self._max_prefix_length)
+        for i in range(start, len(text)):
+            tail = text[i:]
+            if any(prefix.startswith(tail) for prefix in self._prefixes):
+                self._pending = tail
+                text = text[:i]
+                break
+
+        return translate_paths_in_text(text, self.path_mappings)
+
+    def flush(self):
+        """Returns the held back text."""
+        text = self._pending
+        self._pending = ''
+
+        return translate_paths_in_text(text, self.path_mappings)
+
+
+class LocalBackend():
+    """Runs PHPUnit on the host."""
+
+    is_local = True
+
+    def __init__(self, settings):
+        self.settings = settings
+
+    def host_path_mappings(self):
+        """Returns the path mappings from the runtime back to the host."""
+        return {}
+
+    def to_runtime_path(self, path):
+        return path
+
+    def wrap(self, cmd, working_dir, env):
+        """Returns the cmd and env to run {cmd} with {env} in the runtime."""
+        return cmd, env
+
+
+class RuntimeBackend(LocalBackend):
+    """
+    Base for backends that run PHPUnit outside of the host. Host paths are
+    translated to runtime paths using the "phpunit.path_mappings" setting.
+    """
+
+    is_local = False
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.path_mappings = {}
+        for host_path, runtime_path in (settings.get('phpunit.path_mappings') or {}).items():
+            self.path_mappings[filter_path(host_path)] = runtime_path
+
+    def host_path_mappings(self):
+        return {v: k for k, v in self.path_mappings.items()}
+
+    def to_runtime_path(self, path):
+        return translate_path(path, self.path_mappings)
+
+
+class ContainerBackend(RuntimeBackend):
+    """
+    Runs PHPUnit in an already running Docker or Podman container via exec.
+    Containers are never started; the running container is reused so each
+    run only costs an exec.
+    """
+
+    def __init__(self, settings, engine='docker'):
+        super().__init__(settings)
+        self.engine = engine
+        self.container = settings.get('phpunit.backend_container')
+        if not self.container:
+            raise ValueError("'phpunit.backend_container' is not set")
+
+    def wrap(self, cmd, working_dir, env):
+        runtime_cmd = [self.engine, 'exec', '-w', self.to_runtime_path(working_dir)]
+        for k, v in sorted(env.items()):
+            runtime_cmd += ['-e', '%s=%s' % (k, v)]
+
+        runtime_cmd.append(self.container)
+        runtime_cmd += [self.to_runtime_path(arg) for arg in cmd]
+
+        return runtime_cmd, {}
+
+
+class CommandPrefixBackend(RuntimeBackend):
+    """
+    Runs PHPUnit prefixed by an arbitrary command e.g. ssh to a local VM. The
+    placeholder {working_dir} in the prefix is replaced by the runtime working
+    directory. Connection reuse is left to the prefix command e.g. ssh
+    ControlMaster and ControlPersist.
+
+    Commands like ssh join their arguments into a command line that is run
+    by a shell, so by default the arguments (and {working_dir}) are shell
+    quoted. Set "phpunit.backend_command_shell_quote" to false for prefixes
+    that exec the arguments directly.
+    """
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.prefix = settings.get('phpunit.backend_command_prefix')
+        if not self.prefix:
+            raise ValueError("'phpunit.backend_command_prefix' is not set")
+
+        shell_quote = settings.get('phpunit.backend_command_shell_quote')
+        self.quote = shlex.quote if shell_quote or shell_quote is None else str
+
+    def wrap(self, cmd, working_dir, env):
+        runtime_working_dir = self.quote(self.to_runtime_path(working_dir))
+        runtime_cmd = [arg.replace('{working_dir}', runtime_working_dir) for arg in self.prefix]
+        if env:
+            runtime_cmd.append('env')
+            runtime_cmd += [self.quote('%s=%s' % (k, v)) for k, v in sorted(env.items())]
+
+        runtime_cmd += [self.quote(self.to_runtime_path(arg)) for arg in cmd]
+
+        return runtime_cmd, {}
+
+
+BACKENDS = {
+    'local': LocalBackend,
+    'docker': lambda settings: ContainerBackend(settings, 'docker'),
+    'podman': lambda settings: ContainerBackend(settings, 'podman'),
+    'command_prefix': CommandPrefixBackend
+}
+
+
+def get_backend(view):
+    name = view.settings().get('phpunit.backend') or 'local'
+    if name not in BACKENDS:
+        raise ValueError("'phpunit.backend' '%s' is not a valid backend" % name)
+
+    return BACKENDS[name](view.settings())
@@ -0,0 +1,293 @@
+import os
+import re
+import subprocess
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+
+import sublime
+
+from .backends import translate_path
+from .results import get_cache_path
+from .results import parse_results_log
+from .results import parse_test_files
+from .results import read_json
+from .results import write_json
+from .util import debug_message
+from .util import is_file_executable
+
+
+_INVALID_FILE_NAME_CHARS = re.compile('[^a-zA-Z0-9_.-]')
+_PATH_SEPARATORS = re.compile('[/\\\\]')
+
+_coverage_drivers = {}
+
+# Seconds a detected coverage driver is reused for. Enabling or disabling an
+# extension only changes the PHP configuration, not the executable.
+_COVERAGE_DRIVER_TTL = 60
+
+
+def _coverage_driver_probe(php_cmd, wrap=None):
+    cmd = php_cmd + [
+        '-r',
+        "echo extension_loaded('pcov') ? 'pcov' : (extension_loaded('xdebug') ? 'xdebug' : '');"
+    ]
+
+    if wrap:
+        cmd = wrap(cmd)
+
+    return cmd
+
+
+def _executable_mtime(executable):
+    try:
+        return os.path.getmtime(executable)
+    except OSError:
+        return None
+
+
+def get_cached_coverage_driver(php_cmd, wrap=None):
+    """
+    Returns a tuple (found, driver) of the code coverage driver detected
+    for {php_cmd} within the last minute, unless the executable changed
+    since; found is False if it needs to be detected again.
+    """
+    cached = _coverage_drivers.get(tuple(_coverage_driver_probe(php_cmd, wrap)))
+    if cached:
+        detected, mtime, driver = cached
+        if time.time() - detected < _COVERAGE_DRIVER_TTL and mtime == _executable_mtime(php_cmd[0]):
+            return True, driver
+
+    return False, None
+
+
+def get_coverage_driver(php_cmd, wrap=None):
+    """
+    Returns the code coverage driver ('pcov' or 'xdebug') loaded by the PHP
+    run by {php_cmd} e.g. ['php']; otherwise None. The {wrap} function, if
+    given, wraps the probe command to run it in a backend runtime. Results
+    are cached briefly per command; see get_cached_coverage_driver().
+    """
+    found, driver = get_cached_coverage_driver(php_cmd, wrap)
+    if found:
+        return driver
+
+    cmd = _coverage_driver_probe(php_cmd, wrap)
+    mtime = _executable_mtime(php_cmd[0])
+
+    startupinfo = None
+    if sublime.platform() == 'windows':
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+    try:
+        output = subprocess.check_output(cmd, stderr=subprocess.DEVNULL, startupinfo=startupinfo, timeout=5)
+        driver = output.decode('utf-8').strip() or None
+    except Exception as e:
+        debug_message('could not detect coverage driver for %s: %s' % (php_cmd, e))
+        driver = None
+
+    _coverage_drivers[tuple(cmd)] = (time.time(), mtime, driver)
+
+    return driver
+
+
+def detect_coverage_driver_async(php_cmd, wrap, on_done):
+    """
+    Detects the code coverage driver of {php_cmd} in the background, so
+    the probe doesn't block the UI. {on_done} is then called with the
+    driver on the main thread.
+    """
+    def _detect():
+        driver = get_coverage_driver(php_cmd, wrap)
+        sublime.set_timeout(lambda: on_done(driver), 0)
+
+    threading.Thread(target=_detect).start()
+
+
+def has_coverage_options(options):
+    """True if {options} explicitly ask PHPUnit for a code coverage report."""
+    for k, v in options.items():
+        if v and k.startswith('coverage-'):
+            return True
+    return False
+
+
+def coverage_file_name(working_dir, file=None):
+    """
+    Returns the name of the serialized (--coverage-php) code coverage file
+    for {file}. Each test file writes its own coverage file so that running
+    one file only replaces that file's coverage in the merged report.
+    """
+    if file:
+        name = os.path.relpath(file, working_dir)
+        name = _INVALID_FILE_NAME_CHARS.sub('_', name)
+    else:
+        name = 'suite'
+
+    return os.path.join(working_dir, 'build', 'coverage', 'php', name + '.cov')
+
+
+def merge_coverage(working_dir):
+    """
+    Merges all serialized code coverage files into the HTML report at
+    build/coverage using phpcov, if phpcov is installed via Composer.
+    """
+    if sublime.platform() == 'windows':
+        phpcov_executable = os.path.join(working_dir, 'vendor', 'bin', 'phpcov.bat')
+    else:
+        phpcov_executable = os.path.join(working_dir, 'vendor', 'bin', 'phpcov')
+
+    if not is_file_executable(phpcov_executable):
+        debug_message('phpcov not found; skipping code coverage merge')
+        return
+
+    coverage_dir = os.path.join(working_dir, 'build', 'coverage')
+    cmd = [phpcov_executable, 'merge', '--html', coverage_dir, os.path.join(coverage_dir, 'php')]
+
+    def _merge():
+        debug_message('merging coverage: %s' % cmd)
+        try:
+            subprocess.check_call(cmd, cwd=working_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            sublime.set_timeout(lambda: sublime.status_message('PHPUnit: code coverage merged into %s' % coverage_dir), 0)
+        except Exception as e:
+            print('PHPUnit: could not merge code coverage: {}'.format(e))
+
+    threading.Thread(target=_merge).start()
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_coverage_xml(coverage_xml_dir, host_path_mappings=None):
+    """
+    Returns a dict of source file to a dict of line number to the set of
+    test ids that covered the line, from a PHPUnit XML coverage report.
+    """
+    index_file = os.path.join(coverage_xml_dir, 'index.xml')
+    if not os.path.isfile(index_file):
+        return {}
+
+    source = None
+    for element in ElementTree.parse(index_file).iter():
+        if _local_name(element.tag) == 'project':
+            source = element.get('source')
+            break
+
+    if not source:
+        return {}
+
+    coverage = {}
+    for root, dirs, files in os.walk(coverage_xml_dir):
+        for name in files:
+            if not name.endswith('.xml') or name == 'index.xml':
+                continue
+
+            source_file = None
+            lines = {}
+            for element in ElementTree.parse(os.path.join(root, name)).iter():
+                tag = _local_name(element.tag)
+                if tag == 'file' and source_file is None:
+                    parts = [part for part in _PATH_SEPARATORS.split(element.get('path') or '') if part]
+                    source_file = '/'.join([source.rstrip('/\\')] + parts + [element.get('name')])
+                elif tag == 'line' and element.get('nr'):
+                    tests = set(covered.get('by') for covered in element if _local_name(covered.tag) == 'covered')
+                    if tests:
+                        lines[int(element.get('nr'))] = tests
+
+            if source_file and lines:
+                if host_path_mappings:
+                    source_file = translate_path(source_file, host_path_mappings)
+                coverage[os.path.normpath(source_file)] = lines
+
+    return coverage
+
+
+class CoverageIndex():
+    """
+    Persistent per-project reverse index of source file lines to the tests
+    that executed them, built from the "with Coverage" runs.
+    """
+
+    def __init__(self, working_dir):
+        self.file = get_cache_path(working_dir, 'coverage_index.json')
+        self._index = None
+
+    def index(self):
+        if self._index is None:
+            self._index = read_json(self.file, {'lines': {}, 'test_files': {}})
+
+        return self._index
+
+    def update(self, coverage, tests_run, test_files):
+        """
+        Replaces the coverage of the {tests_run} with the {coverage} of the
+        run, and records the {test_files} of the test case classes.
+        """
+        index = self.index()
+        tests_run = set(tests_run)
+        for lines in coverage.values():
+            for tests in lines.values():
+                tests_run.update(tests)
+
+        for source_file in list(index['lines']):
+            lines = index['lines'][source_file]
+            for line in list(lines):
+                lines[line] = [test_id for test_id in lines[line] if test_id not in tests_run]
+                if not lines[line]:
+                    del lines[line]
+
+            if not lines:
+                del index['lines'][source_file]
+
+        for source_file, lines in coverage.items():
+            indexed_lines = index['lines'].setdefault(source_file, {})
+            for line, tests in lines.items():
+                indexed_lines[str(line)] = sorted(set(indexed_lines.get(str(line), [])) | tests)
+
+        index['test_files'].update(test_files)
+
+        write_json(self.file, index)
+
+    def tests_covering(self, source_file, lines):
+        """Returns a sorted list of the test ids that executed any of the {lines} of the {source_file}."""
+        indexed_lines = self.index()['lines'].get(os.path.normpath(source_file), {})
+        tests = set()
+        for line in lines:
+            tests.update(indexed_lines.get(str(line), []))
+
+        return sorted(tests)
+
+    def test_files(self, test_ids):
+        """Returns the sorted known files of the test case classes of the {test_ids}."""
+        test_files = self.index()['test_files']
+        files = set()
+        for test_id in test_ids:
+            class_name = test_id.split('::', 1)[0]
+            if class_name not in test_files:
+                return []
+            files.add(test_files[class_name])
+
+        return sorted(files)
+
+
+def update_coverage_index(working_dir, coverage_xml_dir, results_log_file=None, host_path_mappings=None):
+    """Merges the XML coverage report of a run into the coverage index, in the background."""
+    def _update():
+        try:
+            coverage = parse_coverage_xml(coverage_xml_dir, host_path_mappings)
+            tests_run = []
+            test_files = {}
+            if results_log_file and os.path.isfile(results_log_file):
+                tests_run = parse_results_log(results_log_file).keys()
+                test_files = parse_test_files(results_log_file)
+                if host_path_mappings:
+                    test_files = {k: translate_path(v, host_path_mappings) for k, v in test_files.items()}
+
+            CoverageIndex(working_dir).update(coverage, tests_run, test_files)
+            debug_message('coverage index updated with %d source files' % len(coverage))
+        except Exception as e:
+            print('PHPUnit: could not update the coverage index: {}'.format(e))
+
+    threading.Thread(target=_update).start()
@@ -0,0 +1,112 @@
+import re
+
+
+_SECTION = re.compile('^There (?:was|were) [0-9]+ (failure|error|warning|risky test|incomplete test|skipped test)s?:$')
+_DEFECT = re.compile('^[0-9]+\\) (.+)$')
+_FRAME = re.compile('^((?:[a-zA-Z]:)?[\\\\/].*?)(?::| on line )([0-9]+)$')
+
+_failure_indexes = {}
+
+
+class Failure():
+
+    def __init__(self, test_id, kind):
+        self.test_id = test_id
+        self.kind = kind
+        self.message = None
+        self.frames = []
+
+    @property
+    def location(self):
+        """
+        The (file, line) of the assertion or error in the test. PHPUnit
+        ends the stack trace at the test, so it's the last frame.
+        """
+        if self.frames:
+            return self.frames[-1]
+
+        return None
+
+
+class FailureIndex():
+    """
+    Index of the failures and errors in the PHPUnit results, built from the
+    output as it streams. Navigating it doesn't re-scan the results panel.
+    The {located} failures, those with a location, are the ones navigated.
+    """
+
+    def __init__(self):
+        self.failures = []
+        self.located = []
+        self.position = -1
+        self._buffers = {}
+        self._section = None
+        self._failure = None
+
+    def feed(self, text, stream=None):
+        """
+        Feeds output {text}. Partial lines are buffered per {stream} so that
+        lines of stdout and stderr are never joined. Not thread safe.
+        """
+        lines = (self._buffers.get(stream, '') + text.replace('\r\n', '\n')).split('\n')
+        self._buffers[stream] = lines.pop()
+        for line in lines:
+            self._parse_line(line.rstrip())
+
+    def _parse_line(self, line):
+        match = _SECTION.match(line)
+        if match:
+            self._section = match.group(1)
+            self._failure = None
+            return
+
+        if self._section not in ('failure', 'error'):
+            return
+
+        match = _DEFECT.match(line)
+        if match:
+            self._failure = Failure(match.group(1), self._section)
+            self.failures.append(self._failure)
+            return
+
+        if not self._failure:
+            return
+
+        match = _FRAME.match(line)
+        if match:
+            if not self._failure.frames:
+                self.located.append(self._failure)
+            self._failure.frames.append((match.group(1), int(match.group(2))))
+        elif line and self._failure.message is None and not self._failure.frames:
+            self._failure.message = line
+
+    def next(self):
+        """Returns the next failure, wrapping around; otherwise None."""
+        return self._move(1)
+
+    def previous(self):
+        """Returns the previous failure, wrapping around; otherwise None."""
+        return self._move(-1)
+
+    def _move(self, step):
+        if not self.located:
+            return None
+
+        if self.position == -1 and step < 0:
+            self.position = 0
+
+        self.position = (self.position + step) % len(self.located)
+
+        return self.located[self.position]
+
+
+def start_failure_index(window_id):
+    """Starts a new failure index for the window with {window_id}."""
+    index = FailureIndex()
+    _failure_indexes[window_id] = index
+
+    return index
+
+
+def get_failure_index(window_id):
+    return _failure_indexes.get(window_id)
@@ -0,0 +1,112 @@
+import html
+
+import sublime
+
+from .results import MethodStats
+from .util import find_php_classes
+from .util import find_php_namespace
+from .util import is_valid_php_identifier
+
+
+_phantom_sets = {}
+
+
+def heat(method_stats, slow_threshold, failure_threshold):
+    """
+    Returns the (scope, label) used to shade a test method with
+    {method_stats} [runs, failures, total duration]. Methods that failed
+    in at least {failure_threshold} of their runs are red, methods slower
+    on average than {slow_threshold} seconds are orange, and the rest are
+    green.
+    """
+    runs, failures, total_duration = method_stats
+    mean_duration = total_duration / runs if runs else 0.0
+    failure_rate = failures / runs if runs else 0.0
+
+    if failures and failure_rate >= failure_threshold:
+        scope = 'region.redish'
+    elif mean_duration >= slow_threshold:
+        scope = 'region.orangish'
+    else:
+        scope = 'region.greenish'
+
+    label = '%s avg, %d%% failed (%d run%s)' % (
+        format_duration(mean_duration),
+        round(failure_rate * 100),
+        runs,
+        '' if runs == 1 else 's')
+
+    return scope, label
+
+
+def format_duration(seconds):
+    if seconds < 1:
+        return '%dms' % round(seconds * 1000)
+
+    return '%.2fs' % seconds
+
+
+def find_test_methods(view):
+    """Returns a list of (method name, region) of the test methods in the {view}."""
+    methods = []
+    for region in view.find_by_selector('entity.name.function'):
+        name = view.substr(region)
+        if name[:4] == 'test' and is_valid_php_identifier(name):
+            methods.append((name, region))
+
+    return methods
+
+
+def show_heatmap(view, working_dir, slow_threshold, failure_threshold):
+    """
+    Shades each test method in the {view} with its historical duration and
+    failure rate. Returns the number of methods shaded.
+    """
+    stats = MethodStats(working_dir)
+    namespace = find_php_namespace(view)
+    class_names = [
+        (namespace + '\\' + class_name if namespace else class_name)
+        for class_name in find_php_classes(view) if class_name[-4:] == 'Test'
+    ]
+
+    regions_by_scope = {}
+    phantoms = []
+    for method_name, region in find_test_methods(view):
+        for class_name in class_names:
+            method_stats = stats.get(class_name + '::' + method_name)
+            if method_stats:
+                break
+        else:
+            continue
+
+        scope, label = heat(method_stats, slow_threshold, failure_threshold)
+        regions_by_scope.setdefault(scope, []).append(region)
+        phantoms.append(sublime.Phantom(
+            sublime.Region(view.line(region).b),
+            '<body><span style="color: var(--%s)">&nbsp;&nbsp;%s</span></body>' % (scope.split('.')[1], html.escape(label)),
+            sublime.LAYOUT_INLINE
+        ))
+
+    hide_heatmap(view)
+
+    for scope, regions in regions_by_scope.items():
+        view.add_regions('phpunit.heatmap.' + scope, regions, scope, '', sublime.DRAW_NO_OUTLINE)
+
+    phantom_set = sublime.PhantomSet(view, 'phpunit.heatmap')
+    phantom_set.update(phantoms)
+    _phantom_sets[view.id()] = phantom_set
+
+    return len(phantoms)
+
+
+def hide_heatmap(view):
+    for scope in ('region.redish', 'region.orangish', 'region.greenish'):
+        view.erase_regions('phpunit.heatmap.' + scope)
+
+    phantom_set = _phantom_sets.pop(view.id(), None)
+    if phantom_set:
+        phantom_set.update([])
+
+
+def is_heatmap_visible(view):
+    return view.id() in _phantom_sets
@@ -0,0 +1,128 @@
+import os
+import shutil
+import threading
+import time
+
+import sublime
+
+from .util import debug_message
+
+
+def limit_cmd(cmd, process_memory_limit=None, nice=None, ionice=False, timeout=None):
+    """
+    Returns {cmd} wrapped to run with an address space limit of
+    {process_memory_limit} MB and at {nice} priority (also at the lowest
+    best-effort IO priority if {ionice}). If {timeout} is set the command is
+    terminated after that many seconds by timeout(1), for commands run in
+    a container or on another host where killing the local client doesn't
+    stop them. Not supported on Windows.
+    """
+    if sublime.platform() == 'windows':
+        return cmd
+
+    if process_memory_limit:
+        # The shell execs the command so it keeps the pid and the limit.
+        cmd = ['sh', '-c', 'ulimit -v %d && exec "$@"' % (int(process_memory_limit) * 1024), 'sh'] + cmd
+
+    if timeout:
+        cmd = ['timeout', str(timeout)] + cmd
+
+    if ionice:
+        cmd = ['ionice', '-c', '2', '-n', '7'] + cmd
+
+    if nice is not None:
+        cmd = ['nice', '-n', str(nice)] + cmd
+
+    return cmd
+
+
+def can_ionice():
+    return sublime.platform() == 'linux' and bool(shutil.which('ionice'))
+
+
+def parse_proc_status_peak_rss(status):
+    """Returns the peak resident set size in kB (VmHWM) from /proc/{pid}/status; otherwise None."""
+    for line in status.splitlines():
+        if line.startswith('VmHWM:'):
+            return int(line.split()[1])
+
+    return None
+
+
+def parse_proc_stat_cpu_time(stat, clock_ticks):
+    """Returns the user plus system CPU time in seconds from /proc/{pid}/stat."""
+    # The command name, field 2, can contain spaces; fields after it are
+    # space separated starting with field 3 (state). utime and stime are
+    # fields 14 and 15.
+    fields = stat[stat.rindex(')') + 2:].split()
+
+    return (int(fields[11]) + int(fields[12])) / clock_ticks
+
+
+class ProcessMonitor(threading.Thread):
+    """
+    Samples the peak RSS and CPU time of the process with {pid} from /proc
+    until it exits or is stopped. Child processes, e.g. those started by
+    --process-isolation, aren't counted. Linux only.
+    """
+
+    def __init__(self, pid, interval=0.1):
+        super().__init__()
+        self.daemon = True
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss = None
+        self.cpu_time = None
+        self.started = time.time()
+        self.wall_time = None
+        self._stopped = threading.Event()
+
+    def run(self):
+        clock_ticks = os.sysconf('SC_CLK_TCK')
+        while not self._stopped.is_set():
+            try:
+                with open('/proc/%d/status' % self.pid, 'r') as f:
+                    peak_rss = parse_proc_status_peak_rss(f.read())
+
+                with open('/proc/%d/stat' % self.pid, 'r') as f:
+                    cpu_time = parse_proc_stat_cpu_time(f.read(), clock_ticks)
+            except (IOError, ValueError, IndexError):
+                break
+
+            if peak_rss is None:
+                # Zombie; the process has exited.
+                break
+
+            self.peak_rss = peak_rss
+            self.cpu_time = cpu_time
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self.wall_time = time.time() - self.started
+        self._stopped.set()
+
+    def report(self):
+        if self.peak_rss is None:
+            return 'wall time %.2fs' % (self.wall_time or 0)
+
+        return 'peak RSS %.1fMB, CPU time %.2fs, wall time %.2fs' % (self.peak_rss / 1024, self.cpu_time, self.wall_time or 0)
+
+
+def start_process_monitor(proc):
+    """
+    Starts monitoring the exec {proc}; returns None if not supported on this
+    platform.
+    """
+    if sublime.platform() != 'linux':
+        return None
+
+    popen = getattr(proc, 'proc', None)
+    if not popen:
+        return None
+
+    debug_message('monitoring process %d' % popen.pid)
+
+    monitor = ProcessMonitor(popen.pid)
+    monitor.start()
+
+    return monitor
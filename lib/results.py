@@ -0,0 +1,311 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+
+import sublime
+
+from .util import debug_message
+
+
+def get_cache_path(working_dir, name):
+    """
+    Returns the path of the {name} file in the plugin cache for the project
+    at {working_dir}.
+    """
+    project = hashlib.md5(working_dir.encode('utf-8')).hexdigest()
+
+    return os.path.join(sublime.cache_path(), 'phpunitkit', project, name)
+
+
+def read_json(file, default):
+    try:
+        with open(file, 'r') as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return default
+
+
+def write_json(file, data):
+    """Writes {data} to {file} atomically."""
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    tmp_file = file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+
+    os.replace(tmp_file, file)
+
+
+def get_run_path(working_dir, backend, name):
+    """
+    Returns the path of the {name} file or directory PHPUnit writes to for
+    a run e.g. the JUnit XML log. Runtime backends can't write to the plugin
+    cache on the host so they write to the project build directory instead.
+    """
+    if backend.is_local:
+        path = get_cache_path(working_dir, name)
+    else:
+        path = os.path.join(working_dir, 'build', 'phpunitkit', name)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    return path
+
+
+def parse_results_log(results_log_file):
+    """
+    Returns a dict of test id (Class::method) to [outcome, duration] from a
+    PHPUnit JUnit XML log file. Outcome is one of 'passed', 'failed',
+    'error', or 'skipped'.
+    """
+    results = {}
+
+    for testcase in ElementTree.parse(results_log_file).iter('testcase'):
+        class_name = testcase.get('class') or testcase.get('classname') or ''
+        test_id = class_name + '::' + testcase.get('name', '')
+
+        if testcase.find('failure') is not None:
+            outcome = 'failed'
+        elif testcase.find('error') is not None:
+            outcome = 'error'
+        elif testcase.find('skipped') is not None:
+            outcome = 'skipped'
+        else:
+            outcome = 'passed'
+
+        results[test_id] = [outcome, round(float(testcase.get('time') or 0), 6)]
+
+    return results
+
+
+def parse_test_files(results_log_file):
+    """Returns a dict of test case class to file from a PHPUnit JUnit XML log file."""
+    test_files = {}
+    for testcase in ElementTree.parse(results_log_file).iter('testcase'):
+        class_name = testcase.get('class') or testcase.get('classname')
+        if class_name and testcase.get('file'):
+            test_files[class_name] = testcase.get('file')
+
+    return test_files
+
+
+class History():
+    """
+    Bounded per-project store of test run results. The oldest runs are
+    evicted once the store holds {size} runs.
+    """
+
+    def __init__(self, working_dir, size=None):
+        self.file = get_cache_path(working_dir, 'history.json')
+        self.size = size or 20
+
+    def runs(self):
+        """Returns the runs, oldest first."""
+        return read_json(self.file, [])
+
+    def add(self, tests):
+        runs = self.runs()
+        runs.append({'time': int(time.time()), 'tests': tests})
+        runs = runs[-self.size:]
+
+        write_json(self.file, runs)
+
+
+def load_results(results_log_file):
+    """Returns the results from {results_log_file}; otherwise None."""
+    if not results_log_file or not os.path.isfile(results_log_file):
+        debug_message('results log file %s not found' % results_log_file)
+        return None
+
+    try:
+        return parse_results_log(results_log_file)
+    except Exception as e:
+        print('PHPUnit: could not parse results log file: {}'.format(e))
+        return None
+
+
+class FlakyTests():
+    """
+    Persistent per-project record of how many times each test was run and
+    how many times it failed and then passed on retry (flaked).
+    """
+
+    def __init__(self, working_dir):
+        self.file = get_cache_path(working_dir, 'flaky.json')
+
+    def stats(self):
+        """Returns a dict of test id to [runs, flakes]."""
+        return read_json(self.file, {})
+
+    def record(self, run_tests=None, flaked_tests=None):
+        stats = self.stats()
+
+        for test_id in run_tests or []:
+            stats.setdefault(test_id, [0, 0])[0] += 1
+
+        for test_id in flaked_tests or []:
+            stats.setdefault(test_id, [1, 0])[1] += 1
+
+        write_json(self.file, stats)
+
+    def rates(self):
+        """Returns a list of (test id, flake rate, flakes, runs) of tests that flaked, highest rate first."""
+        rates = []
+        for test_id, (runs, flakes) in self.stats().items():
+            if flakes:
+                rates.append((test_id, flakes / max(runs, flakes), flakes, runs))
+
+        return sorted(rates, key=lambda rate: (-rate[1], rate[0]))
+
+
+def method_stats_key(test_id):
+    """
+    Returns the method stats key, Namespace\\ClassName::method, of {test_id}.
+    Data sets of a method are aggregated.
+    """
+    return test_id.split(' ', 1)[0]
+
+
+class MethodStats():
+    """
+    Persistent per-project stats of each test method: the number of runs,
+    failures, and the total duration.
+    """
+
+    def __init__(self, working_dir):
+        self.file = get_cache_path(working_dir, 'method_stats.json')
+        self._stats = None
+
+    def stats(self):
+        """Returns a dict of method stats key to [runs, failures, total duration]."""
+        if self._stats is None:
+            self._stats = read_json(self.file, {})
+
+        return self._stats
+
+    def get(self, key):
+        return self.stats().get(key)
+
+    def record(self, results):
+        stats = self.stats()
+
+        for test_id, (outcome, duration) in results.items():
+            if outcome == 'skipped':
+                continue
+
+            method_stats = stats.setdefault(method_stats_key(test_id), [0, 0, 0.0])
+            method_stats[0] += 1
+            method_stats[1] += 1 if is_failure(outcome) else 0
+            method_stats[2] = round(method_stats[2] + duration, 6)
+
+        write_json(self.file, stats)
+
+
+def is_failure(outcome):
+    return outcome in ('failed', 'error')
+
+
+def compare_runs(previous, latest):
+    """
+    Returns a tuple of sorted lists (newly failing, newly passing) of tests
+    run in both the {previous} and {latest} runs.
+    """
+    newly_failing = []
+    newly_passing = []
+
+    for test_id, result in latest['tests'].items():
+        if test_id not in previous['tests']:
+            continue
+
+        previous_outcome = previous['tests'][test_id][0]
+        if is_failure(result[0]) and previous_outcome == 'passed':
+            newly_failing.append(test_id)
+        elif result[0] == 'passed' and is_failure(previous_outcome):
+            newly_passing.append(test_id)
+
+    return sorted(newly_failing), sorted(newly_passing)
+
+
+def find_flaky_tests(runs):
+    """
+    Returns a sorted list of tests whose outcome flipped between passed and
+    failed more than once across {runs}.
+    """
+    last_outcomes = {}
+    flips = {}
+
+    for run in runs:
+        for test_id, result in run['tests'].items():
+            if result[0] == 'skipped':
+                continue
+
+            failed = is_failure(result[0])
+            if test_id in last_outcomes and last_outcomes[test_id] != failed:
+                flips[test_id] = flips.get(test_id, 0) + 1
+
+            last_outcomes[test_id] = failed
+
+    return sorted(test_id for test_id, count in flips.items() if count > 1)
+
+
+def failed_tests(results):
+    """Returns the sorted test ids of the failed tests in {results}."""
+    return sorted(test_id for test_id, result in results.items() if is_failure(result[0]))
+
+
+def plan_retry(retry, results, max_attempts):
+    """
+    Returns a tuple (flaked, retry, retry again) after the failed tests of
+    the {retry} state, {'attempt': n, 'failed': [...], 'flaked': [...]},
+    were re-run with {results}. Flaked are the tests that passed this
+    attempt. The returned retry state holds the tests still failing and all
+    the tests that flaked so far; they are retried again if any are still
+    failing and fewer than {max_attempts} attempts were made.
+    """
+    flaked = [test_id for test_id in retry['failed'] if test_id in results and results[test_id][0] == 'passed']
+    still_failing = [test_id for test_id in retry['failed'] if test_id not in flaked]
+    retry_again = bool(still_failing) and retry['attempt'] < max_attempts
+
+    return flaked, {
+        'attempt': retry['attempt'] + 1 if retry_again else retry['attempt'],
+        'failed': still_failing,
+        'flaked': retry['flaked'] + flaked
+    }, retry_again
+
+
+def record_results_async(phpunit, on_done):
+    """
+    Loads the results of the run described by {phpunit}, the exec command
+    state, and records them in the history, method stats, and flaky tests
+    stores, in the background. {on_done} is then called with the results on
+    the main thread, or with None if the run wrote no results e.g. it was
+    killed or PHP had a fatal error.
+    """
+    def _record():
+        results = load_results(phpunit.get('results_log_file'))
+        if not results:
+            sublime.set_timeout(lambda: on_done(None), 0)
+            return
+
+        working_dir = phpunit['working_dir']
+
+        try:
+            if not phpunit.get('retry'):
+                if phpunit.get('history'):
+                    History(working_dir, phpunit.get('history_size')).add(results)
+                    MethodStats(working_dir).record(results)
+
+                if phpunit.get('retry_failed'):
+                    FlakyTests(working_dir).record(run_tests=results.keys())
+            else:
+                flaked = plan_retry(phpunit['retry'], results, phpunit.get('retry_failed', 0))[0]
+                if flaked:
+                    FlakyTests(working_dir).record(flaked_tests=flaked)
+        except Exception as e:
+            print('PHPUnit: could not record results: {}'.format(e))
+
+        sublime.set_timeout(lambda: on_done(results), 0)
+
+    threading.Thread(target=_record).start()
@@ -0,0 +1,442 @@
+import os
+import re
+import shutil
+import xml.etree.ElementTree as ElementTree
+
+import sublime
+
+from .backends import get_backend
+from .coverage import coverage_file_name
+from .coverage import detect_coverage_driver_async
+from .coverage import get_cached_coverage_driver
+from .coverage import has_coverage_options
+from .resources import can_ionice
+from .resources import limit_cmd
+from .results import get_run_path
+from .util import build_cmd_options
+from .util import common_directory
+from .util import debug_message
+from .util import exec_file_regex
+from .util import filter_path
+from .util import find_phpunit_working_directory
+from .util import get_window_setting
+from .util import is_debug
+from .util import is_file_executable
+from .util import is_valid_php_version_file_version
+from .util import set_window_setting
+
+
+def escape_filter(string):
+    """Escapes {string} for use in a PHPUnit --filter regular expression."""
+    return re.escape(string).replace('/', '\\/')
+
+
+def build_class_filter(class_names):
+    """
+    Returns a PHPUnit --filter pattern that matches all the tests of the
+    {class_names}, with or without a namespace.
+    """
+    return '(?:^|\\\\)(?:' + '|'.join(escape_filter(class_name) for class_name in class_names) + ')::'
+
+
+def build_filter(test_ids):
+    """
+    Returns a PHPUnit --filter pattern that matches the {test_ids}
+    (Class::method, optionally with a data set). Methods are grouped by
+    class to keep the pattern short; data sets of a method all match.
+    """
+    methods_by_class = {}
+    for test_id in test_ids:
+        class_name, method_name = test_id.split('::', 1)
+        method_name = method_name.split(' ', 1)[0]
+        methods = methods_by_class.setdefault(class_name, [])
+        if method_name not in methods:
+            methods.append(method_name)
+
+    alternatives = []
+    for class_name in sorted(methods_by_class):
+        methods = methods_by_class[class_name]
+        if len(methods) == 1:
+            alternatives.append(escape_filter(class_name) + '::' + escape_filter(methods[0]))
+        else:
+            alternatives.append(escape_filter(class_name) + '::(?:' + '|'.join(escape_filter(m) for m in methods) + ')')
+
+    return '^(?:' + '|'.join(alternatives) + ')( with data set .+)?$'
+
+
+def find_test_directories(working_dir):
+    """
+    Returns the test directories of the test suites configured in the
+    phpunit.xml (or phpunit.xml.dist) in {working_dir}.
+    """
+    if not working_dir:
+        return []
+
+    for name in ('phpunit.xml', 'phpunit.xml.dist'):
+        configuration_file = os.path.join(working_dir, name)
+        if os.path.isfile(configuration_file):
+            break
+    else:
+        return []
+
+    try:
+        root = ElementTree.parse(configuration_file).getroot()
+    except (ElementTree.ParseError, IOError) as e:
+        debug_message('could not parse %s: %s' % (configuration_file, e))
+        return []
+
+    directories = []
+    for testsuite in root.iter('testsuite'):
+        for directory in testsuite.findall('directory'):
+            if directory.text and directory.text.strip():
+                directories.append(os.path.normpath(os.path.join(working_dir, directory.text.strip())))
+
+    return directories
+
+
+def find_test_path(working_dir, files):
+    """
+    Returns the nearest common directory of the test {files} if it's within
+    a test directory configured in the project at {working_dir}; otherwise
+    None, to run the configured test suites. PHPUnit runs every test file
+    under the path it's given, so a common directory such as the project
+    root of tests/ and src/Module/Tests/ would include vendor/.
+    """
+    directory = common_directory([os.path.dirname(file) for file in files])
+    if not directory:
+        return None
+
+    directory = os.path.normpath(directory)
+    for test_directory in find_test_directories(working_dir):
+        if directory == test_directory or directory.startswith(os.path.join(test_directory, '')):
+            return directory
+
+    return None
+
+
+class PHPUnit():
+
+    def __init__(self, window):
+        self.window = window
+        self.view = self.window.active_view()
+        if not self.view:
+            raise ValueError('view not found')
+
+    def run(self, working_dir=None, file=None, options=None, coverage=False, retry=None, then=None):
+        """
+        Runs PHPUnit. The runs in {then}, a list of run arguments, are run
+        one after another when this run has finished.
+        """
+        debug_message('running with (working_dir={}, file={}, options={}, coverage={}, retry={}, then={})'.format(working_dir, file, options, coverage, retry, then))
+
+        # Kill any currently running tests
+        self.window.run_command('phpunit_exec', {'kill': True})
+
+        env = {}
+        cmd = []
+
+        try:
+            if not working_dir:
+                working_dir = find_phpunit_working_directory(self.view.file_name(), self.window.folders())
+                if not working_dir:
+                    raise ValueError('working directory not found')
+
+            if not os.path.isdir(working_dir):
+                raise ValueError('working directory does not exist or is not a valid directory')
+
+            debug_message('working dir = %s' % working_dir)
+
+            backend = get_backend(self.view)
+            debug_message('backend = %s' % backend.__class__.__name__)
+
+            if backend.is_local:
+                php_executable = self.get_php_executable(working_dir)
+                if php_executable:
+                    env['PATH'] = os.path.dirname(php_executable) + os.pathsep + os.environ['PATH']
+                    debug_message('php executable = %s' % php_executable)
+                else:
+                    php_executable = shutil.which('php')
+
+                php_cmd = [php_executable] if php_executable else None
+                php_cmd_wrap = None
+            else:
+                php_cmd = ['php']
+
+                def php_cmd_wrap(cmd):
+                    return backend.wrap(cmd, working_dir, {})[0]
+
+            phpunit_executable = self.get_phpunit_executable(working_dir, backend)
+            cmd.append(phpunit_executable)
+            debug_message('phpunit executable = %s' % phpunit_executable)
+
+            run_options = options
+            options = self.filter_options(options)
+            # Options added by the plugin for this run only; the filtered
+            # options are what is remembered for the "Test Last" command.
+            cmd_options = dict(options)
+
+            driver = None
+            if php_cmd and (coverage or (self.view.settings().get('phpunit.auto_disable_coverage') and not has_coverage_options(cmd_options))):
+                found, driver = get_cached_coverage_driver(php_cmd, php_cmd_wrap)
+                if not found:
+                    # The probe runs PHP, possibly in a container, so it's
+                    # run in the background and the run is started again.
+                    return detect_coverage_driver_async(
+                        php_cmd,
+                        php_cmd_wrap,
+                        lambda driver: self.run(working_dir, file, run_options, coverage, retry, then))
+
+                debug_message('coverage driver = %s' % driver)
+
+            if coverage:
+                if not driver:
+                    raise ValueError('no code coverage driver (Xdebug or PCOV) found')
+
+                cmd_options.pop('no-coverage', None)
+                cmd_options['coverage-php'] = coverage_file_name(working_dir, file)
+                os.makedirs(os.path.dirname(cmd_options['coverage-php']), exist_ok=True)
+                env['XDEBUG_MODE'] = 'coverage'
+
+                # The XML report records the tests that covered each line,
+                # which is merged into the coverage index after the run.
+                coverage_xml_dir = get_run_path(working_dir, backend, 'coverage-xml')
+                shutil.rmtree(coverage_xml_dir, ignore_errors=True)
+                cmd_options['coverage-xml'] = coverage_xml_dir
+            elif self.view.settings().get('phpunit.auto_disable_coverage') and not has_coverage_options(cmd_options):
+                if driver:
+                    cmd_options['no-coverage'] = True
+                    if driver == 'xdebug':
+                        env['XDEBUG_MODE'] = 'off'
+
+            retry_failed = self.view.settings().get('phpunit.retry_failed')
+
+            results_log_file = None
+            if (self.view.settings().get('phpunit.history') or retry_failed or coverage) and not cmd_options.get('log-junit'):
+                results_log_file = get_run_path(working_dir, backend, 'junit.xml')
+                cmd_options['log-junit'] = results_log_file
+                if os.path.isfile(results_log_file):
+                    os.remove(results_log_file)
+
+            memory_limit = self.view.settings().get('phpunit.memory_limit')
+            if memory_limit:
+                ini = cmd_options.get('d') or []
+                cmd_options['d'] = (ini if isinstance(ini, list) else [ini]) + ['memory_limit=%s' % memory_limit]
+
+            debug_message('options = %s' % cmd_options)
+
+            cmd = build_cmd_options(cmd_options, cmd)
+
+            if file:
+                if os.path.isfile(file) or os.path.isdir(file):
+                    # The file is kept absolute so that it can be re-run,
+                    # e.g. by "Test Last" and failed test retries.
+                    cmd.append(os.path.relpath(file, working_dir))
+                    debug_message('file = %s' % file)
+                else:
+                    raise ValueError("test file '%s' not found" % file)
+
+            # Local runs are killed by the exec command on timeout. Killing
+            # the client of a runtime backend, e.g. docker exec, leaves the
+            # tests running, so they are also timed out in the runtime.
+            timeout = self.view.settings().get('phpunit.timeout')
+
+            cmd = limit_cmd(
+                cmd,
+                process_memory_limit=self.view.settings().get('phpunit.process_memory_limit'),
+                nice=self.view.settings().get('phpunit.nice'),
+                ionice=self.view.settings().get('phpunit.nice') is not None and backend.is_local and can_ionice(),
+                timeout=None if backend.is_local else timeout)
+
+            cmd, env = backend.wrap(cmd, working_dir, env)
+
+        except Exception as e:
+            print('PHPUnit: {}'.format(e))
+            return sublime.status_message(str(e))
+
+        debug_message('env = %s' % env)
+        debug_message('cmd = %s' % cmd)
+
+        if self.view.settings().get('phpunit.save_all_on_run'):
+            # Write out every buffer in active
+            # window that has changes and is
+            # a real file on disk.
+            for view in self.window.views():
+                if view.is_dirty() and view.file_name():
+                    view.run_command('save')
+
+        self.window.run_command('phpunit_exec', {
+            'phpunit': {
+                'working_dir': working_dir,
+                'coverage': coverage,
+                'host_path_mappings': backend.host_path_mappings(),
+                'results_log_file': results_log_file,
+                'coverage_xml_dir': cmd_options.get('coverage-xml') if coverage else None,
+                'history': self.view.settings().get('phpunit.history'),
+                'history_size': self.view.settings().get('phpunit.history_size'),
+                'file': file,
+                'options': options,
+                'retry_failed': retry_failed,
+                'retry': retry,
+                'then': then,
+                'timeout': timeout,
+                'monitor': backend.is_local
+            },
+            'env': env,
+            'cmd': cmd,
+            'file_regex': exec_file_regex(),
+            'quiet': not is_debug(self.view),
+            'shell': False,
+            'syntax': 'Packages/phpunitkit/test-results.hidden-tmLanguage',
+            'word_wrap': False,
+            'working_dir': working_dir
+        })
+
+        if not retry:
+            set_window_setting('phpunit._test_last', {
+                'working_dir': working_dir,
+                'file': file,
+                'options': options,
+                'coverage': coverage
+            }, window=self.window)
+
+        if self.view.settings().get('phpunit.color_scheme'):
+            color_scheme = self.view.settings().get('phpunit.color_scheme')
+        else:
+            color_scheme = self.view.settings().get('color_scheme')
+
+        self.window.create_output_panel('exec').settings().set('color_scheme', color_scheme)
+
+    def run_last(self):
+        kwargs = get_window_setting('phpunit._test_last', window=self.window)
+        if kwargs:
+            self.run(**kwargs)
+
+    def run_file(self, coverage=False):
+        file = self.view.file_name()
+        if not file:
+            return
+
+        self.run(file=file, coverage=coverage)
+
+    def run_files(self, files):
+        """
+        Runs the test cases in {files}, a list of (file, class names), in a
+        single PHPUnit process per project. The files of a project are run
+        with a filter that matches only their test case classes, in their
+        nearest common directory if it's within a configured test directory
+        (see find_test_path), otherwise in the configured test suites.
+        """
+        if not files:
+            return
+
+        working_dirs = []
+        files_by_working_dir = {}
+        for file, class_names in files:
+            working_dir = find_phpunit_working_directory(file, self.window.folders())
+            if working_dir not in files_by_working_dir:
+                working_dirs.append(working_dir)
+                files_by_working_dir[working_dir] = []
+
+            files_by_working_dir[working_dir].append((file, class_names))
+
+        runs = []
+        for working_dir in working_dirs:
+            project_files = files_by_working_dir[working_dir]
+            if len(project_files) == 1:
+                runs.append({'working_dir': working_dir, 'file': project_files[0][0]})
+                continue
+
+            directory = find_test_path(working_dir, [file for file, class_names in project_files])
+            class_names = sorted(set(class_name for file, names in project_files for class_name in names))
+
+            debug_message('batching %d files in %s: %s' % (len(project_files), directory or working_dir, class_names))
+
+            runs.append({'working_dir': working_dir, 'file': directory, 'options': {'filter': build_class_filter(class_names)}})
+
+        if len(runs) > 1:
+            # One project at a time; the exec panel runs a single process.
+            runs[0]['then'] = runs[1:]
+
+        self.run(**runs[0])
+
+    def run_tests(self, working_dir, test_ids, test_files):
+        """
+        Runs the {test_ids} (Class::method) in a single PHPUnit process,
+        with a filter matching only the tests. The nearest common directory
+        of their {test_files} is run if it's within a configured test
+        directory (see find_test_path); otherwise the configured test suites.
+        """
+        file = find_test_path(working_dir, test_files) if test_files else None
+
+        debug_message('running %d tests in %s: %s' % (len(test_ids), file, test_ids))
+
+        self.run(working_dir=working_dir, file=file, options={'filter': build_filter(test_ids)})
+
+    def filter_options(self, options):
+        if options is None:
+            options = {}
+
+        for k, v in get_window_setting('phpunit.options', default={}, window=self.window).items():
+            if k not in options:
+                options[k] = v
+
+        for k, v in self.view.settings().get('phpunit.options').items():
+            if k not in options:
+                options[k] = v
+
+        return options
+
+    def get_php_executable(self, working_dir):
+        php_version_file = os.path.join(working_dir, '.php-version')
+        if os.path.isfile(php_version_file):
+            with open(php_version_file, 'r') as f:
+                php_version_number = f.read().strip()
+
+            if not is_valid_php_version_file_version(php_version_number):
+                raise ValueError("'%s' file contents is not a valid version number" % php_version_file)
+
+            php_versions_path = self.view.settings().get('phpunit.php_versions_path')
+            if not php_versions_path:
+                raise ValueError("'phpunit.php_versions_path' is not set")
+
+            php_versions_path = filter_path(php_versions_path)
+            if not os.path.isdir(php_versions_path):
+                raise ValueError("'phpunit.php_versions_path' '%s' does not exist or is not a valid directory" % php_versions_path)
+
+            if sublime.platform() == 'windows':
+                php_executable = os.path.join(php_versions_path, php_version_number, 'php.exe')
+            else:
+                php_executable = os.path.join(php_versions_path, php_version_number, 'bin', 'php')
+
+            if not is_file_executable(php_executable):
+                raise ValueError("php executable '%s' is not an executable file" % php_executable)
+
+            return php_executable
+
+        php_executable = self.view.settings().get('phpunit.php_executable')
+        if php_executable:
+            php_executable = filter_path(php_executable)
+            if not is_file_executable(php_executable):
+                raise ValueError("'phpunit.php_executable' '%s' is not an executable file" % php_executable)
+
+            return php_executable
+
+        return None
+
+    def get_phpunit_executable(self, working_dir, backend):
+        if sublime.platform() == 'windows':
+            composer_phpunit_executable = os.path.join(working_dir, os.path.join('vendor', 'bin', 'phpunit.bat'))
+        else:
+            composer_phpunit_executable = os.path.join(working_dir, os.path.join('vendor', 'bin', 'phpunit'))
+
+        if self.view.settings().get('phpunit.composer') and is_file_executable(composer_phpunit_executable):
+            return composer_phpunit_executable
+        else:
+            if not backend.is_local:
+                return 'phpunit'
+
+            executable = shutil.which('phpunit')
+            if executable:
+                return executable
+            else:
+                raise ValueError('phpunit not found')
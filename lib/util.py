@@ -0,0 +1,196 @@
+import os
+import re
+
+import sublime
+
+
+DEBUG = bool(os.getenv('SUBLIME_PHPUNIT_DEBUG'))
+
+if DEBUG:
+    def debug_message(msg):
+        print('PHPUnit: %s' % str(msg))
+else:
+    def debug_message(msg):
+        pass
+
+
+def is_debug(view=None):
+    if view is not None:
+        return view.settings().get('phpunit.debug') or (view.settings().get('debug') and view.settings().get('phpunit.debug') is not False)
+    else:
+        return DEBUG
+
+
+def get_window_setting(key, default=None, window=None):
+    if not window:
+        window = sublime.active_window()
+
+    if window.settings().has(key):
+        return window.settings().get(key)
+
+    view = window.active_view()
+
+    if view and view.settings().has(key):
+        return view.settings().get(key)
+
+    return default
+
+
+def set_window_setting(key, value, window):
+    window.settings().set(key, value)
+
+
+def find_phpunit_configuration_file(file_name, folders):
+    """
+    Find the first PHPUnit configuration file, either phpunit.xml or
+    phpunit.xml.dist, in {file_name} directory or the nearest common ancestor
+    directory in {folders}.
+    """
+    debug_message('Find PHPUnit configuration file for %s in %s (%d)' % (file_name, folders, len(folders) if folders else 0))
+
+    if file_name is None:
+        return None
+
+    if not isinstance(file_name, str):
+        return None
+
+    if not len(file_name) > 0:
+        return None
+
+    if folders is None:
+        return None
+
+    if not isinstance(folders, list):
+        return None
+
+    if not len(folders) > 0:
+        return None
+
+    ancestor_folders = []
+    common_prefix = os.path.commonprefix(folders)
+    parent = os.path.dirname(file_name)
+    while parent not in ancestor_folders and parent.startswith(common_prefix):
+        ancestor_folders.append(parent)
+        parent = os.path.dirname(parent)
+
+    ancestor_folders.sort(reverse=True)
+
+    debug_message('  Found %d common ancestor folder%s %s' % (len(ancestor_folders), '' if len(ancestor_folders) == 1 else 's', ancestor_folders))
+
+    for folder in ancestor_folders:
+        debug_message('    Searching folder: %s' % folder)
+        for file_name in ['phpunit.xml', 'phpunit.xml.dist']:
+            phpunit_configuration_file = os.path.join(folder, file_name)
+            debug_message('     Checking: %s' % phpunit_configuration_file)
+            if os.path.isfile(phpunit_configuration_file):
+                debug_message('  Found PHPUnit configuration file: %s' % phpunit_configuration_file)
+                return phpunit_configuration_file
+
+    debug_message('  PHPUnit Configuration file not found')
+
+    return None
+
+
+def find_phpunit_working_directory(file_name, folders):
+    configuration_file = find_phpunit_configuration_file(file_name, folders)
+    if configuration_file:
+        return os.path.dirname(configuration_file)
+    return None
+
+
+_PHP_IDENTIFIER = re.compile('^[a-zA-Z_][a-zA-Z0-9_]*$')
+
+
+def is_valid_php_identifier(string):
+    return _PHP_IDENTIFIER.match(string)
+
+
+def find_php_classes(view):
+    """Returns an array of classes (class names) defined in the view."""
+    classes = []
+
+    for class_as_region in view.find_by_selector('source.php entity.name.type.class - meta.use'):
+        class_as_string = view.substr(class_as_region)
+        if is_valid_php_identifier(class_as_string):
+            classes.append(class_as_string)
+
+    # Quick fix for ST build >= 3114 because the default PHP package changed the
+    # scope on class entities.
+    if not classes:
+        for class_as_region in view.find_by_selector('source.php entity.name.class - meta.use'):
+            class_as_string = view.substr(class_as_region)
+            if is_valid_php_identifier(class_as_string):
+                classes.append(class_as_string)
+
+    return classes
+
+
+_PHP_NAMESPACE = re.compile('^\\s*namespace\\s+([a-zA-Z_][a-zA-Z0-9_\\\\]*)')
+
+
+def find_php_namespace(view):
+    """Returns the namespace declared in the view; otherwise None."""
+    for namespace_as_region in view.find_by_selector('source.php entity.name.namespace'):
+        match = _PHP_NAMESPACE.match(view.substr(view.line(namespace_as_region)))
+        if match:
+            return match.group(1)
+
+    return None
+
+
+def exec_file_regex():
+    # A path starts a line or follows whitespace, and its line number ends
+    # the line; otherwise any character is allowed in it.
+    if sublime.platform() == 'windows':
+        return '(?:^|(?<=\\s))((?:[a-zA-Z]:)?\\\\.*?)(?: on line |:)([0-9]+)\\s*$'
+    else:
+        return '(?:^|(?<=\\s))(/.*?)(?: on line |:)([0-9]+)\\s*$'
+
+
+def is_file_executable(file):
+    return os.path.isfile(file) and os.access(file, os.X_OK)
+
+
+_PHP_VERSION_FILE_VERSION = re.compile('^(?:master|[1-9]\\.[0-9]+(?:snapshot|\\.[0-9]+(?:snapshot)?)|[1-9]\\.x|[1-9]\\.[0-9]+\\.x)$')
+
+
+def is_valid_php_version_file_version(version):
+    return bool(_PHP_VERSION_FILE_VERSION.match(version))
+
+
+def build_cmd_options(options, cmd):
+    for k, v in options.items():
+        if v:
+            if len(k) == 1:
+                if isinstance(v, list):
+                    for _v in v:
+                        cmd.append('-' + k)
+                        cmd.append(_v)
+                else:
+                    cmd.append('-' + k)
+                    if v is not True:
+                        cmd.append(v)
+            else:
+                cmd.append('--' + k)
+                if v is not True:
+                    cmd.append(v)
+
+    return cmd
+
+
+def common_directory(directories):
+    """
+    Returns the nearest common ancestor of {directories}; otherwise None,
+    e.g. for directories on different drives. Unlike os.path.commonprefix
+    it doesn't return a partial name: /a/Foo and /a/FooBar have /a in
+    common. (os.path.commonpath needs Python 3.5.)
+    """
+    prefix = os.path.commonprefix([os.path.join(directory, '') for directory in directories])
+
+    return os.path.dirname(prefix) or None
+
+
+def filter_path(path):
+    path = os.path.expanduser(path)
+    path = os.path.expandvars(path)
+    return path
@@ -1,108 +1,24 @@
 import re
 import os
-import shutil
 
 
 import sublime
 import sublime_plugin
 
+from Default.exec import ExecCommand
 
-DEBUG = bool(os.getenv('SUBLIME_PHPUNIT_DEBUG'))
+from .lib.util import debug_message
+from .lib.util import find_php_classes
+from .lib.util import find_phpunit_working_directory
+from .lib.util import get_window_setting
+from .lib.util import is_valid_php_identifier
+from .lib.util import set_window_setting
 
-if DEBUG:
-    def debug_message(msg):
-        print('PHPUnit: %s' % str(msg))
-else:
-    def debug_message(msg):
-        pass
-
-
-def is_debug(view=None):
-    if view is not None:
-        return view.settings().get('phpunit.debug') or (view.settings().get('debug') and view.settings().get('phpunit.debug') is not False)
-    else:
-        return DEBUG
-
-
-def get_window_setting(key, default=None, window=None):
-    if not window:
-        window = sublime.active_window()
-
-    if window.settings().has(key):
-        return window.settings().get(key)
-
-    view = window.active_view()
-
-    if view and view.settings().has(key):
-        return view.settings().get(key)
-
-    return default
-
-
-def set_window_setting(key, value, window):
-    window.settings().set(key, value)
-
-
-def find_phpunit_configuration_file(file_name, folders):
-    """
-    Find the first PHPUnit configuration file, either phpunit.xml or
-    phpunit.xml.dist, in {file_name} directory or the nearest common ancestor
-    directory in {folders}.
-    """
-    debug_message('Find PHPUnit configuration file for %s in %s (%d)' % (file_name, folders, len(folders) if folders else 0))
-
-    if file_name is None:
-        return None
-
-    if not isinstance(file_name, str):
-        return None
-
-    if not len(file_name) > 0:
-        return None
-
-    if folders is None:
-        return None
-
-    if not isinstance(folders, list):
-        return None
-
-    if not len(folders) > 0:
-        return None
-
-    ancestor_folders = []
-    common_prefix = os.path.commonprefix(folders)
-    parent = os.path.dirname(file_name)
-    while parent not in ancestor_folders and parent.startswith(common_prefix):
-        ancestor_folders.append(parent)
-        parent = os.path.dirname(parent)
-
-    ancestor_folders.sort(reverse=True)
-
-    debug_message('  Found %d common ancestor folder%s %s' % (len(ancestor_folders), '' if len(ancestor_folders) == 1 else 's', ancestor_folders))
-
-    for folder in ancestor_folders:
-        debug_message('    Searching folder: %s' % folder)
-        for file_name in ['phpunit.xml', 'phpunit.xml.dist']:
-            phpunit_configuration_file = os.path.join(folder, file_name)
-            debug_message('     Checking: %s' % phpunit_configuration_file)
-            if os.path.isfile(phpunit_configuration_file):
-                debug_message('  Found PHPUnit configuration file: %s' % phpunit_configuration_file)
-                return phpunit_configuration_file
-
-    debug_message('  PHPUnit Configuration file not found')
-
-    return None
-
-
-def find_phpunit_working_directory(file_name, folders):
-    configuration_file = find_phpunit_configuration_file(file_name, folders)
-    if configuration_file:
-        return os.path.dirname(configuration_file)
-    return None
-
-
-def is_valid_php_identifier(string):
-    return re.match('^[a-zA-Z_][a-zA-Z0-9_]*$', string)
+# Re-exported for the tests.
+from .lib.util import build_cmd_options  # noqa: F401
+from .lib.util import exec_file_regex  # noqa: F401
+from .lib.util import find_phpunit_configuration_file  # noqa: F401
+from .lib.util import is_valid_php_version_file_version  # noqa: F401
 
 
 def has_test_case(view):
@@ -113,26 +29,6 @@ def has_test_case(view):
     return False
 
 
-def find_php_classes(view):
-    """Returns an array of classes (class names) defined in the view."""
-    classes = []
-
-    for class_as_region in view.find_by_selector('source.php entity.name.type.class - meta.use'):
-        class_as_string = view.substr(class_as_region)
-        if is_valid_php_identifier(class_as_string):
-            classes.append(class_as_string)
-
-    # Quick fix for ST build >= 3114 because the default PHP package changed the
-    # scope on class entities.
-    if not classes:
-        for class_as_region in view.find_by_selector('source.php entity.name.class - meta.use'):
-            class_as_string = view.substr(class_as_region)
-            if is_valid_php_identifier(class_as_string):
-                classes.append(class_as_string)
-
-    return classes
-
-
 def find_first_switchable(view):
     """Returns the first switchable; otherwise None."""
     debug_message('find_first_switchable(view = %s:%s)' % (view, view.file_name()))
@@ -183,230 +79,284 @@ def find_first_switchable_file(view):
     return file
 
 
-def exec_file_regex():
-    if sublime.platform() == 'windows':
-        return '((?:[a-zA-Z]\:)?\\\\[a-zA-Z0-9 \\.\\/\\\\_-]+)(?: on line |\:)([0-9]+)'
-    else:
-        return '(\\/[a-zA-Z0-9 \\.\\/_-]+)(?: on line |\:)([0-9]+)'
+class PhpunitExecCommand(ExecCommand):
+    """
+    The exec command with hooks for when PHPUnit finishes. The {phpunit}
+    argument carries the state the hooks need about the run.
+    """
+
+    phpunit = {}
+    failure_index = None
+    monitor = None
+    path_translators = None
+    data_is_bytes = True
+    original_output = None
+    batch_output = None
+
+    def run(self, phpunit=None, **kwargs):
+        if kwargs.get('kill'):
+            # exec's AsyncProcess.poll() is True while the process runs.
+            running = bool(self.proc and self.proc.poll())
+            retry = self.phpunit.get('retry') if running else None
+            if running:
+                # Any runs still to come after this one are cancelled.
+                self.batch_output = None
+
+            super().run(**kwargs)
+            if retry:
+                # A killed retry writes no results; finish the retries so
+                # the original run's output is restored.
+                self.on_retries_finished(retry)
+            return
 
+        import threading
 
-def is_file_executable(file):
-    return os.path.isfile(file) and os.access(file, os.X_OK)
+        from .lib.failures import start_failure_index
 
+        self.phpunit = phpunit or {}
+        self.failure_index = start_failure_index(self.window.id())
+        self.monitor = None
+        # exec reads stdout and stderr on their own threads. Each stream
+        # gets its own path translator, by reader thread, so held back
+        # output of one stream is never joined to the other. The lock guards
+        # the translators and the failure index.
+        self.output_lock = threading.Lock()
+        self.path_translators = {} if self.phpunit.get('host_path_mappings') else None
 
-def is_valid_php_version_file_version(version):
-    return bool(re.match('^(?:master|[1-9]\.[0-9]+(?:snapshot|\.[0-9]+(?:snapshot)?)|[1-9]\.x|[1-9]\.[0-9]+\.x)$', version))
+        super().run(**kwargs)
 
+        proc = self.proc
+        if not proc:
+            return
 
-def build_cmd_options(options, cmd):
-    for k, v in options.items():
-        if v:
-            if len(k) == 1:
-                if isinstance(v, list):
-                    for _v in v:
-                        cmd.append('-' + k)
-                        cmd.append(_v)
-                else:
-                    cmd.append('-' + k)
-                    if v is not True:
-                        cmd.append(v)
-            else:
-                cmd.append('--' + k)
-                if v is not True:
-                    cmd.append(v)
-
-    return cmd
-
-
-def filter_path(path):
-    path = os.path.expanduser(path)
-    path = os.path.expandvars(path)
-    return path
-
-
-class PHPUnit():
-
-    def __init__(self, window):
-        self.window = window
-        self.view = self.window.active_view()
-        if not self.view:
-            raise ValueError('view not found')
-
-    def run(self, working_dir=None, file=None, options=None):
-        debug_message('running with (working_dir={}, file={}, options={})'.format(working_dir, file, options))
-
-        # Kill any currently running tests
-        self.window.run_command('exec', {'kill': True})
-
-        env = {}
-        cmd = []
-
-        try:
-            if not working_dir:
-                working_dir = find_phpunit_working_directory(self.view.file_name(), self.window.folders())
-                if not working_dir:
-                    raise ValueError('working directory not found')
-
-            if not os.path.isdir(working_dir):
-                raise ValueError('working directory does not exist or is not a valid directory')
-
-            debug_message('working dir = %s' % working_dir)
-
-            php_executable = self.get_php_executable(working_dir)
-            if php_executable:
-                env['PATH'] = os.path.dirname(php_executable) + os.pathsep + os.environ['PATH']
-                debug_message('php executable = %s' % php_executable)
-
-            phpunit_executable = self.get_phpunit_executable(working_dir)
-            cmd.append(phpunit_executable)
-            debug_message('phpunit executable = %s' % phpunit_executable)
-
-            options = self.filter_options(options)
-            debug_message('options = %s' % options)
-
-            cmd = build_cmd_options(options, cmd)
-
-            if file:
-                if os.path.isfile(file):
-                    file = os.path.relpath(file, working_dir)
-                    cmd.append(file)
-                    debug_message('file = %s' % file)
-                else:
-                    raise ValueError("test file '%s' not found" % file)
-
-        except Exception as e:
-            print('PHPUnit: {}'.format(e))
-            return sublime.status_message(str(e))
-
-        debug_message('env = %s' % env)
-        debug_message('cmd = %s' % cmd)
-
-        if self.view.settings().get('phpunit.save_all_on_run'):
-            # Write out every buffer in active
-            # window that has changes and is
-            # a real file on disk.
-            for view in self.window.views():
-                if view.is_dirty() and view.file_name():
-                    view.run_command('save')
-
-        self.window.run_command('exec', {
-            'env': env,
-            'cmd': cmd,
-            'file_regex': exec_file_regex(),
-            'quiet': not is_debug(self.view),
-            'shell': False,
-            'syntax': 'Packages/phpunitkit/test-results.hidden-tmLanguage',
-            'word_wrap': False,
-            'working_dir': working_dir
-        })
-
-        set_window_setting('phpunit._test_last', {
-            'working_dir': working_dir,
-            'file': file,
-            'options': options
-        }, window=self.window)
-
-        if self.view.settings().get('phpunit.color_scheme'):
-            color_scheme = self.view.settings().get('phpunit.color_scheme')
+        if self.phpunit.get('monitor'):
+            from .lib.resources import start_process_monitor
+            self.monitor = start_process_monitor(proc)
+
+        timeout = self.phpunit.get('timeout')
+        if timeout:
+            sublime.set_timeout(lambda: self.on_timeout(proc, timeout), int(timeout * 1000))
+
+    def on_timeout(self, proc, timeout):
+        # exec's AsyncProcess.poll() is True while the process runs.
+        if proc != self.proc or not proc.poll():
+            return
+
+        message = 'PHPUnit: test run timed out after %ss' % timeout
+        print(message)
+        sublime.status_message(message)
+
+        self.run(kill=True)
+
+    def on_data(self, proc, data):
+        self.data_is_bytes = isinstance(data, bytes)
+        if isinstance(data, bytes):
+            text = data.decode(self.encoding, 'replace')
         else:
-            color_scheme = self.view.settings().get('color_scheme')
+            text = data
+
+        path_translators = self.path_translators
+        if path_translators is not None and proc == self.proc:
+            # Translate runtime paths to host paths so that the results
+            # panel navigation (file_regex) works for container runs.
+            from threading import get_ident
+
+            with self.output_lock:
+                path_translator = path_translators.get(get_ident())
+                if not path_translator:
+                    from .lib.backends import PathTranslator
+                    path_translator = PathTranslator(self.phpunit['host_path_mappings'])
+                    path_translators[get_ident()] = path_translator
+
+                text = path_translator.feed(text)
+
+            if not text:
+                return
+
+            data = text.encode(self.encoding) if isinstance(data, bytes) else text
+
+        self.on_output(proc, text, data)
 
-        self.window.create_output_panel('exec').settings().set('color_scheme', color_scheme)
+    def on_output(self, proc, text, data):
+        if proc == self.proc:
+            self.feed_failure_index(text)
 
-    def run_last(self):
-        kwargs = get_window_setting('phpunit._test_last', window=self.window)
-        if kwargs:
-            self.run(**kwargs)
+        super().on_data(proc, data)
 
-    def run_file(self):
-        file = self.view.file_name()
-        if not file:
+    def feed_failure_index(self, text):
+        failure_index = self.failure_index
+        if not failure_index:
             return
 
-        self.run(file=file)
+        from threading import get_ident
 
-    def filter_options(self, options):
-        if options is None:
-            options = {}
+        # Fed from the stdout and stderr reader threads.
+        with self.output_lock:
+            failure_index.feed(text, get_ident())
 
-        for k, v in get_window_setting('phpunit.options', default={}, window=self.window).items():
-            if k not in options:
-                options[k] = v
+    def on_finished(self, proc):
+        monitor = self.monitor if proc == self.proc else None
+        if monitor:
+            monitor.stop()
 
-        for k, v in self.view.settings().get('phpunit.options').items():
-            if k not in options:
-                options[k] = v
+        self.flush_output(proc)
 
-        return options
+        super().on_finished(proc)
+        sublime.set_timeout(lambda: self.on_phpunit_finished(proc, monitor), 0)
 
-    def get_php_executable(self, working_dir):
-        php_version_file = os.path.join(working_dir, '.php-version')
-        if os.path.isfile(php_version_file):
-            with open(php_version_file, 'r') as f:
-                php_version_number = f.read().strip()
+    def flush_output(self, proc):
+        path_translators = self.path_translators
+        if path_translators is None or proc != self.proc:
+            return
 
-            if not is_valid_php_version_file_version(php_version_number):
-                raise ValueError("'%s' file contents is not a valid version number" % php_version_file)
+        # on_finished is called by the stdout reader thread. The translators
+        # are kept for output of stderr still being read; only what they
+        # hold back is flushed.
+        with self.output_lock:
+            text = ''.join(path_translator.flush() for path_translator in path_translators.values())
 
-            php_versions_path = self.view.settings().get('phpunit.php_versions_path')
-            if not php_versions_path:
-                raise ValueError("'phpunit.php_versions_path' is not set")
+        if text:
+            self.on_output(proc, text, text.encode(self.encoding) if self.data_is_bytes else text)
 
-            php_versions_path = filter_path(php_versions_path)
-            if not os.path.isdir(php_versions_path):
-                raise ValueError("'phpunit.php_versions_path' '%s' does not exist or is not a valid directory" % php_versions_path)
+    def on_phpunit_finished(self, proc, monitor=None):
+        if proc != self.proc:
+            # Killed or superseded by another run.
+            return
 
-            if sublime.platform() == 'windows':
-                php_executable = os.path.join(php_versions_path, php_version_number, 'php.exe')
-            else:
-                php_executable = os.path.join(php_versions_path, php_version_number, 'bin', 'php')
+        if monitor:
+            message = 'PHPUnit: %s' % monitor.report()
+            print(message)
+            sublime.status_message(message)
 
-            if not is_file_executable(php_executable):
-                raise ValueError("php executable '%s' is not an executable file" % php_executable)
+        if self.phpunit.get('coverage'):
+            from .lib.coverage import merge_coverage
+            from .lib.coverage import update_coverage_index
 
-            return php_executable
+            merge_coverage(self.phpunit['working_dir'])
 
-        php_executable = self.view.settings().get('phpunit.php_executable')
-        if php_executable:
-            php_executable = filter_path(php_executable)
-            if not is_file_executable(php_executable):
-                raise ValueError("'phpunit.php_executable' '%s' is not an executable file" % php_executable)
+            if self.phpunit.get('coverage_xml_dir'):
+                update_coverage_index(
+                    self.phpunit['working_dir'],
+                    self.phpunit['coverage_xml_dir'],
+                    self.phpunit.get('results_log_file'),
+                    self.phpunit.get('host_path_mappings'))
 
-            return php_executable
+        from .lib.results import record_results_async
 
-        return None
+        phpunit = self.phpunit
+        record_results_async(phpunit, lambda results: self.on_results(phpunit, results))
 
-    def get_phpunit_executable(self, working_dir):
-        if sublime.platform() == 'windows':
-            composer_phpunit_executable = os.path.join(working_dir, os.path.join('vendor', 'bin', 'phpunit.bat'))
-        else:
-            composer_phpunit_executable = os.path.join(working_dir, os.path.join('vendor', 'bin', 'phpunit'))
+    def on_results(self, phpunit, results):
+        if phpunit is not self.phpunit:
+            # Superseded by another run.
+            return
 
-        if self.view.settings().get('phpunit.composer') and is_file_executable(composer_phpunit_executable):
-            return composer_phpunit_executable
-        else:
-            executable = shutil.which('phpunit')
-            if executable:
-                return executable
-            else:
-                raise ValueError('phpunit not found')
+        from .lib.results import failed_tests
+        from .lib.results import plan_retry
+
+        retry = self.phpunit.get('retry')
+
+        if retry and results is None:
+            # Finish the retries so the original run's output is restored.
+            print('PHPUnit: no test results from retry attempt %d' % retry['attempt'])
+            self.on_retries_finished(retry)
+            return self.on_run_finished()
+
+        if not results:
+            return self.on_run_finished()
+
+        if retry:
+            flaked, retry, retry_again = plan_retry(retry, results, self.phpunit.get('retry_failed', 0))
+            if retry_again:
+                return self.retry(retry)
+
+            self.on_retries_finished(retry)
+            return self.on_run_finished()
+
+        if self.phpunit.get('retry_failed'):
+            failed = failed_tests(results)
+            if failed:
+                # Retries replace the results panel, so the output of the
+                # run is kept to be appended after the last retry.
+                self.original_output = self.get_output()
+                return self.retry({'attempt': 1, 'failed': failed, 'flaked': []})
+
+        self.on_run_finished()
+
+    def on_run_finished(self):
+        then = self.phpunit.get('then')
+        if then:
+            # The next run replaces the results panel, so the output of
+            # this run is kept to be appended after the last run.
+            self.batch_output = (self.batch_output or []) + [self.get_output()]
+
+            from .lib.runner import PHPUnit
+            return PHPUnit(self.window).run(then=then[1:] or None, **then[0])
+
+        for output in self.batch_output or []:
+            self.append_output('[Output of a previous run]', output)
+
+        self.batch_output = None
+
+    def get_output(self):
+        return self.output_view.substr(sublime.Region(0, self.output_view.size()))
+
+    def append_output(self, title, output):
+        text = '\n%s\n\n%s' % (title, output)
+        self.output_view.run_command('append', {'characters': text, 'force': True, 'scroll_to_end': False})
+        self.feed_failure_index(text + '\n')
+
+    def on_retries_finished(self, retry):
+        if self.original_output:
+            self.append_output('[Output of the run before retrying failed tests]', self.original_output)
+            self.original_output = None
+
+        message = 'PHPUnit: %d flaky test%s passed on retry, %d test%s still failing (results show the last retry, then the original run)' % (
+            len(retry['flaked']),
+            '' if len(retry['flaked']) == 1 else 's',
+            len(retry['failed']),
+            '' if len(retry['failed']) == 1 else 's')
+
+        print(message)
+        sublime.status_message(message)
+
+    def retry(self, retry):
+        from .lib.runner import PHPUnit
+        from .lib.runner import build_filter
+
+        failed = retry['failed']
+        debug_message('retrying %d failed test%s (attempt %d): %s' % (len(failed), '' if len(failed) == 1 else 's', retry['attempt'], failed))
+
+        options = dict(self.phpunit.get('options') or {})
+        options['filter'] = build_filter(failed)
+
+        PHPUnit(self.window).run(
+            working_dir=self.phpunit['working_dir'],
+            file=self.phpunit.get('file'),
+            options=options,
+            retry=retry,
+            then=self.phpunit.get('then')
+        )
 
 
 class PhpunitTestSuiteCommand(sublime_plugin.WindowCommand):
 
-    def run(self):
-        PHPUnit(self.window).run()
+    def run(self, coverage=False):
+        from .lib.runner import PHPUnit
+        PHPUnit(self.window).run(coverage=coverage)
 
 
 class PhpunitTestFileCommand(sublime_plugin.WindowCommand):
 
-    def run(self):
-        PHPUnit(self.window).run_file()
+    def run(self, coverage=False):
+        from .lib.runner import PHPUnit
+        PHPUnit(self.window).run_file(coverage=coverage)
 
 
 class PhpunitTestLastCommand(sublime_plugin.WindowCommand):
 
     def run(self):
+        from .lib.runner import PHPUnit
         PHPUnit(self.window).run_last()
 
 
@@ -441,6 +391,7 @@ class PhpunitTestNearestCommand(sublime_plugin.WindowCommand):
             debug_message('Could not find a PHPUnit test case or a switchable test case')
             return
 
+        from .lib.runner import PHPUnit
         PHPUnit(self.window).run(file=unit_test, options=options)
 
     def selected_unit_test_method_names(self, view):
@@ -476,6 +427,174 @@ class PhpunitTestNearestCommand(sublime_plugin.WindowCommand):
         return method_names
 
 
+def find_test_case_files(paths):
+    """
+    Returns a list of (file, class names) of the PHPUnit test case files
+    (*Test.php) in {paths}. The class name is derived from the file name.
+    """
+    files = []
+    for path in paths:
+        if os.path.isfile(path) and path.endswith('Test.php'):
+            files.append((path, [os.path.basename(path)[:-4]]))
+
+    return files
+
+
+class PhpunitTestOpenFilesCommand(sublime_plugin.WindowCommand):
+
+    def run(self):
+        files = []
+        seen = set()
+        for view in self.window.views():
+            if not view.file_name():
+                continue
+
+            if has_test_case(view):
+                file = view.file_name()
+                class_names = [class_name for class_name in find_php_classes(view) if class_name[-4:] == 'Test']
+            else:
+                file = find_first_switchable_file(view)
+                class_names = [os.path.splitext(os.path.basename(file))[0]] if file else []
+
+            if file and file not in seen:
+                seen.add(file)
+                files.append((file, class_names))
+
+        if not files:
+            return sublime.status_message('PHPUnit: no test cases found in open files')
+
+        from .lib.runner import PHPUnit
+        PHPUnit(self.window).run_files(files)
+
+
+class PhpunitTestSelectedFilesCommand(sublime_plugin.WindowCommand):
+
+    def run(self, paths=[]):
+        files = find_test_case_files(paths)
+        if not files:
+            return sublime.status_message('PHPUnit: no test case files selected')
+
+        from .lib.runner import PHPUnit
+        PHPUnit(self.window).run_files(files)
+
+    def is_visible(self, paths=[]):
+        return bool(find_test_case_files(paths))
+
+
+def open_failure(window, failure):
+    file, line = failure.location
+    window.open_file('%s:%d' % (file, line), sublime.ENCODED_POSITION)
+    sublime.status_message('PHPUnit: %s %s' % (failure.test_id, failure.message or ''))
+
+
+class PhpunitNextFailureCommand(sublime_plugin.WindowCommand):
+
+    def run(self, forward=True):
+        from .lib.failures import get_failure_index
+
+        index = get_failure_index(self.window.id())
+        failure = (index.next() if forward else index.previous()) if index else None
+        if not failure:
+            return sublime.status_message('PHPUnit: no failures')
+
+        open_failure(self.window, failure)
+
+
+class PhpunitShowFailuresCommand(sublime_plugin.WindowCommand):
+
+    def run(self):
+        from .lib.failures import get_failure_index
+
+        index = get_failure_index(self.window.id())
+        failures = index.located if index else []
+        if not failures:
+            return sublime.status_message('PHPUnit: no failures')
+
+        items = []
+        for failure in failures:
+            file, line = failure.location
+            items.append([failure.test_id, failure.message or failure.kind, '%s:%d' % (file, line)])
+
+        def on_done(i):
+            if i >= 0:
+                index.position = i
+                open_failure(self.window, failures[i])
+
+        self.window.show_quick_panel(items, on_done)
+
+
+class PhpunitToggleHeatmapCommand(sublime_plugin.WindowCommand):
+
+    def run(self):
+        view = self.window.active_view()
+        if not view:
+            return
+
+        if has_test_case(view):
+            test_view = view
+        else:
+            file = find_first_switchable_file(view)
+            if not file:
+                return sublime.status_message('No PHPUnit switchable found for "%s"' % view.file_name())
+
+            test_view = self.window.find_open_file(file) or self.window.open_file(file)
+
+        from .lib.heatmap import hide_heatmap
+        from .lib.heatmap import is_heatmap_visible
+
+        if is_heatmap_visible(test_view):
+            return hide_heatmap(test_view)
+
+        self.show(test_view)
+
+    def show(self, test_view):
+        if test_view.is_loading():
+            return sublime.set_timeout(lambda: self.show(test_view), 50)
+
+        working_dir = find_phpunit_working_directory(test_view.file_name(), self.window.folders())
+        if not working_dir:
+            return sublime.status_message('Could not find a PHPUnit working directory')
+
+        from .lib.heatmap import show_heatmap
+
+        count = show_heatmap(
+            test_view,
+            working_dir,
+            test_view.settings().get('phpunit.heatmap_slow_threshold', 1.0),
+            test_view.settings().get('phpunit.heatmap_failure_threshold', 0.1)
+        )
+        if not count:
+            sublime.status_message('PHPUnit: no test history for "%s"' % test_view.file_name())
+
+
+class PhpunitTestCoveringLineCommand(sublime_plugin.WindowCommand):
+
+    def run(self):
+        view = self.window.active_view()
+        if not view or not view.file_name():
+            return
+
+        working_dir = find_phpunit_working_directory(view.file_name(), self.window.folders())
+        if not working_dir:
+            return sublime.status_message('Could not find a PHPUnit working directory')
+
+        from .lib.coverage import CoverageIndex
+
+        lines = set()
+        for region in view.sel():
+            for line in view.lines(region):
+                lines.add(view.rowcol(line.begin())[0] + 1)
+
+        index = CoverageIndex(working_dir)
+        test_ids = index.tests_covering(view.file_name(), lines)
+        debug_message('Tests covering %s lines %s: %s' % (view.file_name(), sorted(lines), test_ids))
+        if not test_ids:
+            return sublime.status_message('PHPUnit: no tests cover the line; run tests with coverage to update the coverage index')
+
+        from .lib.runner import PHPUnit
+        PHPUnit(self.window).run_tests(working_dir, test_ids, index.test_files(test_ids))
+
+
 class PhpunitSwitchFile(sublime_plugin.WindowCommand):
 
     def run(self):
@@ -528,6 +647,67 @@ class PhpunitToggleOptionCommand(sublime_plugin.WindowCommand):
         set_window_setting('phpunit.options', options, window=self.window)
 
 
+class PhpunitCompareWithPreviousRunCommand(sublime_plugin.WindowCommand):
+
+    def run(self):
+        view = self.window.active_view()
+        if not view:
+            return
+
+        working_dir = find_phpunit_working_directory(view.file_name(), self.window.folders())
+        if not working_dir:
+            return sublime.status_message('Could not find a PHPUnit working directory')
+
+        from .lib.results import History
+        from .lib.results import compare_runs
+        from .lib.results import find_flaky_tests
+
+        runs = History(working_dir, view.settings().get('phpunit.history_size')).runs()
+        if len(runs) < 2:
+            return sublime.status_message('PHPUnit: no previous run to compare with')
+
+        newly_failing, newly_passing = compare_runs(runs[-2], runs[-1])
+        flaky = find_flaky_tests(runs)
+
+        report = 'Compared with previous run (%d runs in history)\n' % len(runs)
+        for title, tests in (('Newly failing', newly_failing), ('Newly passing', newly_passing), ('Flaky', flaky)):
+            report += '\n%s (%d)\n' % (title, len(tests))
+            for test_id in tests:
+                report += '  %s\n' % test_id
+
+        panel = self.window.create_output_panel('phpunit_compare')
+        panel.settings().set('word_wrap', False)
+        panel.run_command('append', {'characters': report})
+        self.window.run_command('show_panel', {'panel': 'output.phpunit_compare'})
+
+
+class PhpunitShowFlakyTestsCommand(sublime_plugin.WindowCommand):
+
+    def run(self):
+        view = self.window.active_view()
+        if not view:
+            return
+
+        working_dir = find_phpunit_working_directory(view.file_name(), self.window.folders())
+        if not working_dir:
+            return sublime.status_message('Could not find a PHPUnit working directory')
+
+        from .lib.results import FlakyTests
+
+        rates = FlakyTests(working_dir).rates()
+        if not rates:
+            return sublime.status_message('PHPUnit: no flaky tests recorded')
+
+        report = 'Flaky tests (%d)\n\n' % len(rates)
+        for test_id, rate, flakes, runs in rates:
+            report += '  %5.1f%%  %d/%d  %s\n' % (rate * 100, flakes, runs, test_id)
+
+        panel = self.window.create_output_panel('phpunit_flaky')
+        panel.settings().set('word_wrap', False)
+        panel.run_command('append', {'characters': report})
+        self.window.run_command('show_panel', {'panel': 'output.phpunit_flaky'})
+
+
 class PhpunitOpenCodeCoverageCommand(sublime_plugin.WindowCommand):
 
     def run(self):
@@ -0,0 +1,94 @@
+import unittest
+
+from phpunitkit.lib.backends import CommandPrefixBackend
+from phpunitkit.lib.backends import ContainerBackend
+from phpunitkit.lib.backends import PathTranslator
+from phpunitkit.lib.backends import translate_path
+from phpunitkit.lib.backends import translate_paths_in_text
+
+
+class BackendsTest(unittest.TestCase):
+
+    def test_translate_path(self):
+        mappings = {'/home/user/code': '/var/www', '/home/user/code/vendor': '/opt/vendor'}
+
+        self.assertEqual('/var/www', translate_path('/home/user/code', mappings))
+        self.assertEqual('/var/www/tests/FooTest.php', translate_path('/home/user/code/tests/FooTest.php', mappings))
+        self.assertEqual('/opt/vendor/bin/phpunit', translate_path('/home/user/code/vendor/bin/phpunit', mappings))
+
+        self.assertEqual('/home/user/codebase/x.php', translate_path('/home/user/codebase/x.php', mappings))
+        self.assertEqual('--verbose', translate_path('--verbose', mappings))
+        self.assertEqual('tests/FooTest.php', translate_path('tests/FooTest.php', mappings))
+
+    def test_translate_paths_in_text(self):
+        self.assertEqual(
+            '/home/user/code/tests/FooTest.php:12',
+            translate_paths_in_text('/var/www/tests/FooTest.php:12', {'/var/www': '/home/user/code'})
+        )
+
+    def test_path_translator_translates_paths_split_across_chunks(self):
+        translator = PathTranslator({'/var/www': '/home/user/code'})
+
+        output = ''
+        for chunk in ('..F', '.  4 / 4\n\n1) FooTest::testX\n/var', '/w', 'ww/tests/FooTest.php:12\n', 'x /var/ww'):
+            output += translator.feed(chunk)
+
+        self.assertEqual('..F.  4 / 4\n\n1) FooTest::testX\n/home/user/code/tests/FooTest.php:12\nx ', output)
+        self.assertEqual('/var/ww', translator.flush())
+        self.assertEqual('', translator.flush())
+
+    def test_path_translator_passes_progress_output_through(self):
+        translator = PathTranslator({'/var/www': '/home/user/code'})
+
+        self.assertEqual('...', translator.feed('...'))
+        self.assertEqual('.F  63 / 100 ( 63%)', translator.feed('.F  63 / 100 ( 63%)'))
+
+    def test_container_backend_wrap(self):
+        backend = ContainerBackend({
+            'phpunit.backend_container': 'app',
+            'phpunit.path_mappings': {'/code': '/var/www'}
+        }, 'podman')
+
+        self.assertFalse(backend.is_local)
+        self.assertEqual({'/var/www': '/code'}, backend.host_path_mappings())
+        self.assertEqual((
+            ['podman', 'exec', '-w', '/var/www', '-e', 'XDEBUG_MODE=off', 'app', '/var/www/vendor/bin/phpunit', 'tests/FooTest.php'],
+            {}
+        ), backend.wrap(['/code/vendor/bin/phpunit', 'tests/FooTest.php'], '/code', {'XDEBUG_MODE': 'off'}))
+
+    def test_command_prefix_backend_wrap(self):
+        backend = CommandPrefixBackend({
+            'phpunit.backend_command_prefix': ['ssh', 'vm', 'cd', '{working_dir}', '&&'],
+            'phpunit.path_mappings': {'/code': '/home/vagrant/code'}
+        })
+
+        self.assertEqual((
+            ['ssh', 'vm', 'cd', '/home/vagrant/code', '&&', 'env', 'XDEBUG_MODE=off', 'phpunit'],
+            {}
+        ), backend.wrap(['phpunit'], '/code', {'XDEBUG_MODE': 'off'}))
+
+    def test_command_prefix_backend_wrap_shell_quotes_arguments(self):
+        backend = CommandPrefixBackend({
+            'phpunit.backend_command_prefix': ['ssh', 'vm', 'cd', '{working_dir}', '&&'],
+            'phpunit.path_mappings': {'/code': '/home/vagrant/my code'}
+        })
+
+        self.assertEqual((
+            [
+                'ssh', 'vm', 'cd', "'/home/vagrant/my code'", '&&',
+                'phpunit', '--filter', "'::(testA|testB)( with data set .+)?$'", "'/home/vagrant/my code/tests/FooTest.php'"
+            ],
+            {}
+        ), backend.wrap(['phpunit', '--filter', '::(testA|testB)( with data set .+)?$', '/code/tests/FooTest.php'], '/code', {}))
+
+    def test_command_prefix_backend_wrap_without_shell_quoting(self):
+        backend = CommandPrefixBackend({
+            'phpunit.backend_command_prefix': ['vm-exec', '--cwd', '{working_dir}'],
+            'phpunit.backend_command_shell_quote': False,
+            'phpunit.path_mappings': {'/code': '/home/vagrant/my code'}
+        })
+
+        self.assertEqual((
+            ['vm-exec', '--cwd', '/home/vagrant/my code', 'phpunit', '--filter', '::(testA|testB)$'],
+            {}
+        ), backend.wrap(['phpunit', '--filter', '::(testA|testB)$'], '/code', {}))
@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from phpunitkit.lib import coverage
+from phpunitkit.lib.coverage import CoverageIndex
+from phpunitkit.lib.coverage import get_cached_coverage_driver
+from phpunitkit.lib.coverage import get_coverage_driver
+from phpunitkit.lib.coverage import parse_coverage_xml
+
+
+def fixtures_path(path):
+    return os.path.join(os.path.dirname(__file__), 'fixtures', path)
+
+
+class CoverageIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = CoverageIndex(fixtures_path('coverage-xml'))
+        self.index._index = {'lines': {}, 'test_files': {}}
+        self.tmp_dir = tempfile.mkdtemp()
+        self.index.file = os.path.join(self.tmp_dir, 'coverage_index.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_parse_coverage_xml(self):
+        self.assertEqual({
+            os.path.normpath('/code/src/Example.php'): {
+                9: {'App\\ExampleTest::testA', 'App\\ExampleTest::testB with data set #0'},
+                10: {'App\\ExampleTest::testB with data set #0'},
+            },
+            os.path.normpath('/code/src/Sub/Other.php'): {
+                3: {'App\\OtherTest::testC'},
+            }
+        }, parse_coverage_xml(fixtures_path('coverage-xml')))
+
+    def test_parse_coverage_xml_maps_paths_to_the_host(self):
+        coverage = parse_coverage_xml(fixtures_path('coverage-xml'), {'/code': '/home/user/code'})
+
+        self.assertEqual(
+            sorted([os.path.normpath('/home/user/code/src/Example.php'), os.path.normpath('/home/user/code/src/Sub/Other.php')]),
+            sorted(coverage.keys())
+        )
+
+    def test_tests_covering(self):
+        self.index.update(parse_coverage_xml(fixtures_path('coverage-xml')), [], {'App\\ExampleTest': '/code/tests/ExampleTest.php'})
+
+        self.assertEqual(
+            ['App\\ExampleTest::testA', 'App\\ExampleTest::testB with data set #0'],
+            self.index.tests_covering('/code/src/Example.php', [9, 10])
+        )
+        self.assertEqual(['App\\ExampleTest::testB with data set #0'], self.index.tests_covering('/code/src/Example.php', [10]))
+        self.assertEqual([], self.index.tests_covering('/code/src/Example.php', [1]))
+        self.assertEqual([], self.index.tests_covering('/code/src/Unknown.php', [9]))
+
+        self.assertEqual(['/code/tests/ExampleTest.php'], self.index.test_files(['App\\ExampleTest::testA']))
+        self.assertEqual([], self.index.test_files(['App\\ExampleTest::testA', 'App\\OtherTest::testC']))
+
+    def test_update_replaces_the_coverage_of_the_tests_run(self):
+        self.index.update(parse_coverage_xml(fixtures_path('coverage-xml')), [], {})
+        self.index.update({os.path.normpath('/code/src/Example.php'): {12: {'App\\ExampleTest::testA'}}}, ['App\\ExampleTest::testA'], {})
+
+        self.assertEqual(['App\\ExampleTest::testB with data set #0'], self.index.tests_covering('/code/src/Example.php', [9]))
+        self.assertEqual(['App\\ExampleTest::testA'], self.index.tests_covering('/code/src/Example.php', [12]))
+        self.assertEqual(['App\\OtherTest::testC'], self.index.tests_covering('/code/src/Sub/Other.php', [3]))
+
+
+@unittest.skipIf(os.name == 'nt', 'needs a shell script as the PHP executable')
+class CoverageDriverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.php = os.path.join(self.tmp_dir, 'php')
+        self.write_php('xdebug')
+
+    def write_php(self, driver):
+        with open(self.php, 'w') as f:
+            f.write('#!/bin/sh\necho %s\n' % driver)
+        os.chmod(self.php, 0o755)
+
+    def test_driver_is_cached(self):
+        self.assertEqual((False, None), get_cached_coverage_driver([self.php]))
+        self.assertEqual('xdebug', get_coverage_driver([self.php]))
+        self.assertEqual((True, 'xdebug'), get_cached_coverage_driver([self.php]))
+
+    def test_driver_is_detected_again_when_the_executable_changes(self):
+        get_coverage_driver([self.php])
+
+        self.write_php('pcov')
+        os.utime(self.php, (0, 0))
+
+        self.assertEqual((False, None), get_cached_coverage_driver([self.php]))
+        self.assertEqual('pcov', get_coverage_driver([self.php]))
+
+    def test_driver_is_detected_again_when_it_expires(self):
+        get_coverage_driver([self.php])
+
+        key = tuple(coverage._coverage_driver_probe([self.php]))
+        detected, mtime, driver = coverage._coverage_drivers[key]
+        coverage._coverage_drivers[key] = (detected - coverage._COVERAGE_DRIVER_TTL, mtime, driver)
+
+        self.assertEqual((False, None), get_cached_coverage_driver([self.php]))
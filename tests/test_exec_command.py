@@ -0,0 +1,128 @@
+import threading
+import unittest
+
+from phpunitkit.lib.failures import FailureIndex
+from phpunitkit.plugin import PhpunitExecCommand
+
+
+class FakeExecCommand(PhpunitExecCommand):
+    """The exec command with the output captured instead of shown in a panel."""
+
+    def __init__(self, phpunit):
+        self.phpunit = phpunit
+        self.proc = object()
+        self.encoding = 'utf-8'
+        self.output_lock = threading.Lock()
+        self.path_translators = {} if phpunit.get('host_path_mappings') else None
+        self.output = []
+
+    def on_output(self, proc, text, data):
+        self.output.append(text)
+
+
+class FakeProcess():
+    """Sublime's exec AsyncProcess; poll() is True while the process runs."""
+
+    def __init__(self, running):
+        self.running = running
+
+    def poll(self):
+        return self.running
+
+
+class ExecCommandTest(unittest.TestCase):
+
+    def feed_on_thread(self, command, data):
+        thread = threading.Thread(target=lambda: command.on_data(command.proc, data))
+        thread.start()
+        thread.join()
+
+    def test_paths_are_translated_per_output_stream(self):
+        command = FakeExecCommand({'host_path_mappings': {'/var/www': '/code'}})
+
+        command.on_data(command.proc, b'1) FooTest::testX\n/var/w')
+        self.feed_on_thread(command, b'PHP Warning in /var/www/src/Foo.php:3\n')
+        command.on_data(command.proc, b'ww/tests/FooTest.php:12\n')
+
+        self.assertEqual([
+            '1) FooTest::testX\n',
+            'PHP Warning in /code/src/Foo.php:3\n',
+            '/code/tests/FooTest.php:12\n'
+        ], command.output)
+
+    def test_held_back_output_is_flushed_when_finished(self):
+        command = FakeExecCommand({'host_path_mappings': {'/var/www': '/code'}})
+
+        command.on_data(command.proc, b'x /var/ww')
+        self.feed_on_thread(command, b'y /var')
+        command.flush_output(command.proc)
+
+        self.assertEqual(['x ', 'y ', '/var/ww/var'], command.output)
+
+        command.on_data(command.proc, b'/var/www/tests/FooTest.php:12\n')
+
+        self.assertEqual('/code/tests/FooTest.php:12\n', command.output[-1])
+
+    def test_retries_are_finished_when_a_retry_writes_no_results(self):
+        retry = {'attempt': 1, 'failed': ['T::a'], 'flaked': []}
+        command = FakeExecCommand({'retry': retry, 'retry_failed': 2})
+        finished = []
+        command.on_retries_finished = finished.append
+
+        command.on_results(command.phpunit, None)
+
+        self.assertEqual([retry], finished)
+
+    def test_results_of_a_superseded_run_are_ignored(self):
+        command = FakeExecCommand({'retry': {'attempt': 1, 'failed': ['T::a'], 'flaked': []}})
+        finished = []
+        command.on_retries_finished = finished.append
+
+        command.on_results({}, None)
+
+        self.assertEqual([], finished)
+
+    def test_output_of_previous_runs_is_appended_after_the_last_run(self):
+        command = FakeExecCommand({})
+        command.batch_output = ['first run', 'second run']
+        appended = []
+        command.append_output = lambda title, output: appended.append(output)
+
+        command.on_run_finished()
+
+        self.assertEqual(['first run', 'second run'], appended)
+        self.assertIsNone(command.batch_output)
+
+    def test_failure_index_is_fed_per_output_stream(self):
+        command = FakeExecCommand({})
+        command.failure_index = FailureIndex()
+
+        command.feed_failure_index('There was 1 failure:\n\n1) FooTest::testX\nFailed\n\n/code/tests/Foo')
+        thread = threading.Thread(target=lambda: command.feed_failure_index('PHP Warning in /code/src/Bar.php:3\n'))
+        thread.start()
+        thread.join()
+        command.feed_failure_index('Test.php:7\n')
+
+        self.assertEqual(('/code/tests/FooTest.php', 7), command.failure_index.failures[0].location)
+
+    def test_timeout_kills_a_running_process(self):
+        command = FakeExecCommand({})
+        command.proc = FakeProcess(running=True)
+        runs = []
+        command.run = lambda **kwargs: runs.append(kwargs)
+
+        command.on_timeout(command.proc, 300)
+
+        self.assertEqual([{'kill': True}], runs)
+
+    def test_timeout_ignores_a_finished_or_superseded_process(self):
+        command = FakeExecCommand({})
+        runs = []
+        command.run = lambda **kwargs: runs.append(kwargs)
+
+        command.proc = FakeProcess(running=False)
+        command.on_timeout(command.proc, 300)
+
+        command.on_timeout(FakeProcess(running=True), 300)
+
+        self.assertEqual([], runs)
@@ -0,0 +1,109 @@
+import unittest
+
+from phpunitkit.lib.failures import FailureIndex
+
+
+OUTPUT = r'''PHPUnit 6.1.0 by Sebastian Bergmann and contributors.
+
+.FE.R                                                               5 / 5 (100%)
+
+Time: 41 ms, Memory: 4.00MB
+
+There was 1 error:
+
+1) App\ExampleTest::testErrors
+Exception: boom
+
+/code/src/Ex ample+(1).php:9
+/code/tests/ExampleTest.php:19
+
+--
+
+There was 1 failure:
+
+1) App\ExampleTest::testFails with data set #0 (false)
+Failed asserting that false is true.
+
+/code/tests/ExampleTest.php:14
+
+--
+
+There was 1 risky test:
+
+1) App\ExampleTest::testRisky
+This test did not perform any assertions
+
+/code/tests/ExampleTest.php:24
+
+FAILURES!
+Tests: 5, Assertions: 3, Errors: 1, Failures: 1, Risky: 1.
+'''
+
+
+class FailureIndexTest(unittest.TestCase):
+
+    def test_index_is_built_from_streamed_output(self):
+        index = FailureIndex()
+        for i in range(0, len(OUTPUT), 7):
+            index.feed(OUTPUT[i:i + 7])
+
+        self.assertEqual(2, len(index.failures))
+
+        error, failure = index.failures
+
+        self.assertEqual('App\\ExampleTest::testErrors', error.test_id)
+        self.assertEqual('error', error.kind)
+        self.assertEqual('Exception: boom', error.message)
+        self.assertEqual([('/code/src/Ex ample+(1).php', 9), ('/code/tests/ExampleTest.php', 19)], error.frames)
+        self.assertEqual(('/code/tests/ExampleTest.php', 19), error.location)
+
+        self.assertEqual('App\\ExampleTest::testFails with data set #0 (false)', failure.test_id)
+        self.assertEqual('failure', failure.kind)
+        self.assertEqual('Failed asserting that false is true.', failure.message)
+        self.assertEqual(('/code/tests/ExampleTest.php', 14), failure.location)
+
+    def test_windows_paths(self):
+        index = FailureIndex()
+        index.feed('There was 1 failure:\r\n\r\n1) FooTest::testX\r\nFailed\r\n\r\n' + r'C:\code\tests\FooTest.php:7' + '\r\n')
+
+        self.assertEqual((r'C:\code\tests\FooTest.php', 7), index.failures[0].location)
+
+    def test_next_and_previous_wrap_around(self):
+        index = FailureIndex()
+        index.feed(OUTPUT)
+
+        error, failure = index.failures
+
+        self.assertIs(error, index.next())
+        self.assertIs(failure, index.next())
+        self.assertIs(error, index.next())
+        self.assertIs(failure, index.previous())
+
+        index = FailureIndex()
+        index.feed(OUTPUT)
+        self.assertIs(index.failures[1], index.previous())
+
+    def test_no_failures(self):
+        index = FailureIndex()
+        index.feed('OK (5 tests, 5 assertions)\n')
+
+        self.assertEqual([], index.failures)
+        self.assertIsNone(index.next())
+        self.assertIsNone(index.previous())
+
+    def test_failures_without_a_location_are_not_navigated(self):
+        index = FailureIndex()
+        index.feed('There were 2 errors:\n\n1) FooTest::testA\nError\n\n2) FooTest::testB\nError\n\n/code/tests/FooTest.php:7\n')
+
+        self.assertEqual(2, len(index.failures))
+        self.assertEqual([index.failures[1]], index.located)
+        self.assertIs(index.failures[1], index.next())
+        self.assertIs(index.failures[1], index.next())
+
+    def test_partial_lines_are_buffered_per_stream(self):
+        index = FailureIndex()
+        index.feed('There was 1 failure:\n\n1) FooTest::testX\nFailed\n\n/code/tests/Foo', 'stdout')
+        index.feed('PHP Deprecated: x in /code/src/Bar.php on line 3\n', 'stderr')
+        index.feed('Test.php:7\n', 'stdout')
+
+        self.assertEqual([('/code/tests/FooTest.php', 7)], index.failures[0].frames)
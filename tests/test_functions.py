@@ -1,3 +1,4 @@
+import os
 import re
 import unittest
 
@@ -6,6 +7,11 @@ import sublime
 from phpunitkit.plugin import build_cmd_options
 from phpunitkit.plugin import is_valid_php_version_file_version
 from phpunitkit.plugin import exec_file_regex
+from phpunitkit.lib.coverage import coverage_file_name
+from phpunitkit.lib.coverage import has_coverage_options
+from phpunitkit.lib.runner import build_class_filter
+from phpunitkit.lib.runner import build_filter
+from phpunitkit.lib.util import common_directory
 
 
 class FunctionsTest(unittest.TestCase):
@@ -26,6 +32,58 @@ class FunctionsTest(unittest.TestCase):
 
         self.assertEqual(['-d', 'x', '-d', 'y', '-d', 'z'], build_cmd_options({'d': ['x', 'y', 'z']}, []))
 
+    def test_has_coverage_options(self):
+        self.assertFalse(has_coverage_options({}))
+        self.assertFalse(has_coverage_options({'verbose': True}))
+        self.assertFalse(has_coverage_options({'no-coverage': True}))
+        self.assertFalse(has_coverage_options({'coverage-html': False}))
+
+        self.assertTrue(has_coverage_options({'coverage-html': 'build/coverage'}))
+        self.assertTrue(has_coverage_options({'coverage-clover': 'clover.xml', 'verbose': True}))
+
+    def test_coverage_file_name(self):
+        working_dir = os.path.join('/', 'code')
+
+        self.assertEqual(
+            os.path.join(working_dir, 'build', 'coverage', 'php', 'suite.cov'),
+            coverage_file_name(working_dir)
+        )
+
+        self.assertEqual(
+            os.path.join(working_dir, 'build', 'coverage', 'php', 'tests_FooTest.php.cov'),
+            coverage_file_name(working_dir, os.path.join(working_dir, 'tests', 'FooTest.php'))
+        )
+
+    def test_build_class_filter(self):
+        self.assertEqual('(?:^|\\\\)(?:FooTest)::', build_class_filter(['FooTest']))
+        self.assertEqual('(?:^|\\\\)(?:BarTest|FooTest)::', build_class_filter(['BarTest', 'FooTest']))
+
+        self.assertTrue(re.search(build_class_filter(['BarTest', 'FooTest']), 'App\\Tests\\FooTest::testX'))
+        self.assertTrue(re.search(build_class_filter(['BarTest', 'FooTest']), 'BarTest::testX with data set #0'))
+        self.assertFalse(re.search(build_class_filter(['BarTest', 'FooTest']), 'App\\Tests\\SomeFooTest::testX'))
+
+    def test_build_filter(self):
+        self.assertEqual('^(?:FooTest::testA)( with data set .+)?$', build_filter(['FooTest::testA']))
+
+        self.assertEqual(
+            '^(?:App\\\\BarTest::testC|App\\\\FooTest::(?:testA|testB))( with data set .+)?$',
+            build_filter([
+                'App\\FooTest::testA',
+                'App\\FooTest::testB with data set #0',
+                'App\\FooTest::testB with data set #1',
+                'App\\BarTest::testC'
+            ])
+        )
+
+    def test_common_directory(self):
+        self.assertEqual('/code/tests', common_directory(['/code/tests']))
+        self.assertEqual('/code/tests', common_directory(['/code/tests', '/code/tests/']))
+        self.assertEqual('/code/tests', common_directory(['/code/tests/Unit', '/code/tests/Feature/Http']))
+        self.assertEqual('/code/tests', common_directory(['/code/tests/Foo', '/code/tests/FooBar']))
+        self.assertEqual('/code', common_directory(['/code/tests', '/code/testsuite']))
+        self.assertEqual('/', common_directory(['/code', '/other']))
+        self.assertIsNone(common_directory(['code', 'other']))
+
     def test_is_valid_php_version_file_version(self):
         self.assertFalse(is_valid_php_version_file_version(''))
         self.assertFalse(is_valid_php_version_file_version(' '))
@@ -125,6 +183,9 @@ class FunctionsTest(unittest.TestCase):
                 'C:\\home\\user\\code\\test\\bootstrap.php',
                 '6',
             )
+
+            test_matches_one('C:\\code\\Ex ample+(1)\\Ünïcode@Test.php:9', 'C:\\code\\Ex ample+(1)\\Ünïcode@Test.php', '9')
+            self.assertIsNone(re.search(exec_file_regex(), '1) App\\FooTest::testX with data set "a:1"'))
         else:
 
             test_matches_one('/code/file.php:11', '/code/file.php', '11')
@@ -163,3 +224,6 @@ class FunctionsTest(unittest.TestCase):
                 '/home/user/code/test/bootstrap.php',
                 '6',
             )
+
+            test_matches_one('/code/Ex ample+(1)/Ünïcode@Test.php:9', '/code/Ex ample+(1)/Ünïcode@Test.php', '9')
+            self.assertIsNone(re.search(exec_file_regex(), '1) App\\FooTest::testX with data set "a:1"'))
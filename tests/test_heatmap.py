@@ -0,0 +1,23 @@
+import unittest
+
+from phpunitkit.lib.heatmap import format_duration
+from phpunitkit.lib.heatmap import heat
+
+
+class HeatmapTest(unittest.TestCase):
+
+    def test_heat(self):
+        self.assertEqual(('region.greenish', '10ms avg, 0% failed (2 runs)'), heat([2, 0, 0.02], 1.0, 0.1))
+        self.assertEqual(('region.orangish', '1.50s avg, 0% failed (1 run)'), heat([1, 0, 1.5], 1.0, 0.1))
+        self.assertEqual(('region.redish', '1.50s avg, 25% failed (4 runs)'), heat([4, 1, 6.0], 1.0, 0.1))
+        self.assertEqual(('region.redish', '10ms avg, 10% failed (10 runs)'), heat([10, 1, 0.1], 1.0, 0.1))
+
+    def test_heat_below_the_failure_threshold(self):
+        self.assertEqual(('region.greenish', '10ms avg, 5% failed (20 runs)'), heat([20, 1, 0.2], 1.0, 0.1))
+        self.assertEqual(('region.orangish', '1.50s avg, 5% failed (20 runs)'), heat([20, 1, 30.0], 1.0, 0.1))
+
+    def test_format_duration(self):
+        self.assertEqual('0ms', format_duration(0))
+        self.assertEqual('123ms', format_duration(0.1234))
+        self.assertEqual('1.00s', format_duration(1))
+        self.assertEqual('12.35s', format_duration(12.345))
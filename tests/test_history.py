@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from phpunitkit.lib.results import parse_results_log
+from phpunitkit.lib.results import History
+from phpunitkit.lib.results import MethodStats
+from phpunitkit.lib.results import compare_runs
+from phpunitkit.lib.results import find_flaky_tests
+from phpunitkit.lib.results import method_stats_key
+
+
+def fixtures_path(path):
+    return os.path.join(os.path.dirname(__file__), 'fixtures', path)
+
+
+class HistoryTest(unittest.TestCase):
+
+    def test_parse_results_log(self):
+        self.assertEqual({
+            'ExampleTest::testPasses': ['passed', 0.001],
+            'ExampleTest::testFails': ['failed', 0.02],
+            'ExampleTest::testErrors': ['error', 0.1],
+            'ExampleTest::testSkipped': ['skipped', 0.000456],
+        }, parse_results_log(fixtures_path('results/junit.xml')))
+
+    def test_compare_runs(self):
+        previous = {'tests': {
+            'T::a': ['passed', 0.1],
+            'T::b': ['failed', 0.1],
+            'T::c': ['passed', 0.1],
+            'T::d': ['error', 0.1],
+        }}
+
+        latest = {'tests': {
+            'T::a': ['failed', 0.1],
+            'T::b': ['passed', 0.1],
+            'T::c': ['passed', 0.1],
+            'T::d': ['passed', 0.1],
+            'T::e': ['failed', 0.1],
+        }}
+
+        self.assertEqual((['T::a'], ['T::b', 'T::d']), compare_runs(previous, latest))
+
+    def test_find_flaky_tests(self):
+        runs = [
+            {'tests': {'T::a': ['passed', 0], 'T::b': ['passed', 0], 'T::c': ['failed', 0]}},
+            {'tests': {'T::a': ['failed', 0], 'T::b': ['failed', 0], 'T::c': ['skipped', 0]}},
+            {'tests': {'T::a': ['passed', 0], 'T::b': ['failed', 0], 'T::c': ['failed', 0]}},
+        ]
+
+        self.assertEqual(['T::a'], find_flaky_tests(runs))
+        self.assertEqual([], find_flaky_tests([]))
+
+    def test_method_stats_key(self):
+        self.assertEqual('FooTest::testX', method_stats_key('FooTest::testX'))
+        self.assertEqual('App\\Tests\\FooTest::testX', method_stats_key('App\\Tests\\FooTest::testX'))
+        self.assertEqual('App\\FooTest::testX', method_stats_key('App\\FooTest::testX with data set #0'))
+        self.assertEqual('FooTest::testX', method_stats_key('FooTest::testX with data set "a::b"'))
+
+    def test_history_evicts_the_oldest_runs(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+
+        history = History('/code', size=2)
+        history.file = os.path.join(tmp_dir, 'history.json')
+
+        self.assertEqual([], history.runs())
+
+        history.add({'T::a': ['failed', 0.1]})
+        history.add({'T::a': ['passed', 0.2]})
+        history.add({'T::a': ['passed', 0.3]})
+
+        runs = history.runs()
+        self.assertEqual(2, len(runs))
+        self.assertEqual({'T::a': ['passed', 0.2]}, runs[0]['tests'])
+        self.assertEqual({'T::a': ['passed', 0.3]}, runs[1]['tests'])
+
+    def test_method_stats_aggregate_data_sets(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+
+        method_stats = MethodStats('/code')
+        method_stats.file = os.path.join(tmp_dir, 'method_stats.json')
+
+        method_stats.record({
+            'App\\FooTest::testX with data set #0': ['passed', 0.1],
+            'App\\FooTest::testX with data set #1': ['failed', 0.2],
+            'App\\FooTest::testY': ['skipped', 0.0],
+        })
+        method_stats.record({
+            'App\\FooTest::testX with data set #0': ['error', 0.3],
+            'App\\FooTest::testX with data set #1': ['passed', 0.4],
+            'App\\FooTest::testY': ['passed', 0.5],
+            'App\\Feature\\FooTest::testY': ['failed', 2.0],
+        })
+
+        self.assertEqual({
+            'App\\FooTest::testX': [4, 2, 1.0],
+            'App\\FooTest::testY': [1, 0, 0.5],
+            'App\\Feature\\FooTest::testY': [1, 1, 2.0],
+        }, method_stats.stats())
+
+        method_stats = MethodStats('/code')
+        method_stats.file = os.path.join(tmp_dir, 'method_stats.json')
+
+        self.assertEqual([4, 2, 1.0], method_stats.get('App\\FooTest::testX'))
@@ -0,0 +1,49 @@
+import unittest
+
+import sublime
+
+from phpunitkit.lib.resources import limit_cmd
+from phpunitkit.lib.resources import parse_proc_stat_cpu_time
+from phpunitkit.lib.resources import parse_proc_status_peak_rss
+
+
+class ResourcesTest(unittest.TestCase):
+
+    def test_limit_cmd(self):
+        cmd = ['phpunit', 'tests/FooTest.php']
+
+        self.assertEqual(cmd, limit_cmd(cmd))
+
+        if sublime.platform() == 'windows':
+            self.assertEqual(cmd, limit_cmd(cmd, process_memory_limit=512, nice=10, ionice=True))
+            return
+
+        self.assertEqual(['nice', '-n', '10'] + cmd, limit_cmd(cmd, nice=10))
+        self.assertEqual(['nice', '-n', '0'] + cmd, limit_cmd(cmd, nice=0))
+        self.assertEqual(['nice', '-n', '10', 'ionice', '-c', '2', '-n', '7'] + cmd, limit_cmd(cmd, nice=10, ionice=True))
+
+        self.assertEqual(
+            ['sh', '-c', 'ulimit -v 524288 && exec "$@"', 'sh'] + cmd,
+            limit_cmd(cmd, process_memory_limit=512)
+        )
+
+        self.assertEqual(
+            ['nice', '-n', '5', 'sh', '-c', 'ulimit -v 1024 && exec "$@"', 'sh'] + cmd,
+            limit_cmd(cmd, process_memory_limit=1, nice=5)
+        )
+
+        self.assertEqual(['timeout', '300'] + cmd, limit_cmd(cmd, timeout=300))
+
+        self.assertEqual(
+            ['nice', '-n', '5', 'timeout', '300', 'sh', '-c', 'ulimit -v 1024 && exec "$@"', 'sh'] + cmd,
+            limit_cmd(cmd, process_memory_limit=1, nice=5, timeout=300)
+        )
+
+    def test_parse_proc_status_peak_rss(self):
+        self.assertEqual(20480, parse_proc_status_peak_rss('Name:\tphp\nVmPeak:\t  300000 kB\nVmHWM:\t   20480 kB\nVmRSS:\t   10240 kB\n'))
+        self.assertIsNone(parse_proc_status_peak_rss('Name:\tphp\nState:\tZ (zombie)\n'))
+
+    def test_parse_proc_stat_cpu_time(self):
+        stat = '1234 (php (x) y) R 1 1234 1234 0 -1 4194304 100 0 0 0 250 50 0 0 20 0 1 0 100 1000 100'
+
+        self.assertEqual(3.0, parse_proc_stat_cpu_time(stat, 100))
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from phpunitkit.lib.results import FlakyTests
+from phpunitkit.lib.results import failed_tests
+from phpunitkit.lib.results import plan_retry
+from phpunitkit.lib.results import record_results_async
+
+
+class RetriesTest(unittest.TestCase):
+
+    def test_failed_tests(self):
+        self.assertEqual(['T::b', 'T::c'], failed_tests({
+            'T::c': ['error', 0.1],
+            'T::a': ['passed', 0.1],
+            'T::b': ['failed', 0.1],
+            'T::d': ['skipped', 0.1],
+        }))
+
+    def test_plan_retry_splits_flaked_and_still_failing_tests(self):
+        retry = {'attempt': 1, 'failed': ['T::a', 'T::b', 'T::c'], 'flaked': []}
+        results = {'T::a': ['passed', 0.1], 'T::b': ['failed', 0.1]}
+
+        self.assertEqual((['T::a'], {
+            'attempt': 2,
+            'failed': ['T::b', 'T::c'],
+            'flaked': ['T::a']
+        }, True), plan_retry(retry, results, 2))
+
+    def test_plan_retry_stops_at_the_attempt_cap(self):
+        retry = {'attempt': 2, 'failed': ['T::b', 'T::c'], 'flaked': ['T::a']}
+        results = {'T::b': ['passed', 0.1], 'T::c': ['failed', 0.1]}
+
+        self.assertEqual((['T::b'], {
+            'attempt': 2,
+            'failed': ['T::c'],
+            'flaked': ['T::a', 'T::b']
+        }, False), plan_retry(retry, results, 2))
+
+    def test_plan_retry_stops_when_all_tests_pass(self):
+        retry = {'attempt': 1, 'failed': ['T::a'], 'flaked': []}
+
+        self.assertEqual((['T::a'], {
+            'attempt': 1,
+            'failed': [],
+            'flaked': ['T::a']
+        }, False), plan_retry(retry, {'T::a': ['passed', 0.1]}, 3))
+
+    def test_flaky_tests_rates(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+
+        flaky_tests = FlakyTests('/code')
+        flaky_tests.file = os.path.join(tmp_dir, 'flaky.json')
+
+        self.assertEqual([], flaky_tests.rates())
+
+        for i in range(4):
+            flaky_tests.record(run_tests=['T::a', 'T::b', 'T::c', 'T::d'])
+
+        flaky_tests.record(flaked_tests=['T::a', 'T::c', 'T::d'])
+        flaky_tests.record(flaked_tests=['T::c', 'T::d'])
+        flaky_tests.record(flaked_tests=['T::e'])
+
+        self.assertEqual([
+            ('T::e', 1.0, 1, 1),
+            ('T::c', 0.5, 2, 4),
+            ('T::d', 0.5, 2, 4),
+            ('T::a', 0.25, 1, 4),
+        ], flaky_tests.rates())
+
+    def test_record_results_async_calls_back_without_results(self):
+        done = threading.Event()
+        results = []
+
+        def on_done(result):
+            results.append(result)
+            done.set()
+
+        record_results_async({'working_dir': '/code', 'results_log_file': '/code/missing.xml', 'retry': {
+            'attempt': 1,
+            'failed': ['T::a'],
+            'flaked': []
+        }}, on_done)
+
+        self.assertTrue(done.wait(5))
+        self.assertEqual([None], results)
@@ -0,0 +1,125 @@
+import os
+import unittest
+
+from phpunitkit.lib.runner import PHPUnit
+from phpunitkit.lib.runner import find_test_directories
+
+
+def fixtures_path(*paths):
+    return os.path.join(os.path.dirname(__file__), 'fixtures', *paths)
+
+
+def project_path(*paths):
+    return fixtures_path('projects', *paths)
+
+
+class FakeWindow():
+
+    def active_view(self):
+        return object()
+
+    def folders(self):
+        return [project_path('app'), project_path('other')]
+
+
+class RunnerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.runs = []
+        self.phpunit = PHPUnit(FakeWindow())
+        self.phpunit.run = lambda **kwargs: self.runs.append(kwargs)
+
+    def test_find_test_directories(self):
+        self.assertEqual([
+            project_path('app', 'tests', 'Unit'),
+            project_path('app', 'tests', 'Feature'),
+            project_path('app', 'modules', 'Billing', 'tests'),
+        ], find_test_directories(project_path('app')))
+
+        self.assertEqual([project_path('other', 'tests')], find_test_directories(project_path('other')))
+        self.assertEqual([], find_test_directories(fixtures_path('common_prefix_parent')))
+        self.assertEqual([], find_test_directories(None))
+
+    def test_run_files_runs_a_single_file(self):
+        file = project_path('app', 'tests', 'Unit', 'FooTest.php')
+
+        self.phpunit.run_files([(file, ['FooTest'])])
+
+        self.assertEqual([{
+            'working_dir': project_path('app'),
+            'file': file
+        }], self.runs)
+
+    def test_run_files_batches_files_in_their_common_test_directory(self):
+        self.phpunit.run_files([
+            (project_path('app', 'tests', 'Unit', 'Sub', 'BarTest.php'), ['BarTest']),
+            (project_path('app', 'tests', 'Unit', 'FooTest.php'), ['FooTest', 'OtherTest']),
+        ])
+
+        self.assertEqual([{
+            'working_dir': project_path('app'),
+            'file': project_path('app', 'tests', 'Unit'),
+            'options': {'filter': '(?:^|\\\\)(?:BarTest|FooTest|OtherTest)::'}
+        }], self.runs)
+
+    def test_run_files_runs_the_test_suites_if_the_common_directory_is_not_a_test_directory(self):
+        self.phpunit.run_files([
+            (project_path('app', 'tests', 'Unit', 'FooTest.php'), ['FooTest']),
+            (project_path('app', 'modules', 'Billing', 'tests', 'InvoiceTest.php'), ['InvoiceTest']),
+        ])
+
+        self.assertEqual([{
+            'working_dir': project_path('app'),
+            'file': None,
+            'options': {'filter': '(?:^|\\\\)(?:FooTest|InvoiceTest)::'}
+        }], self.runs)
+
+    def test_run_files_runs_each_project_in_turn(self):
+        self.phpunit.run_files([
+            (project_path('app', 'tests', 'Unit', 'FooTest.php'), ['FooTest']),
+            (project_path('other', 'tests', 'OtherTest.php'), ['OtherTest']),
+            (project_path('app', 'tests', 'Feature', 'BazTest.php'), ['BazTest']),
+        ])
+
+        self.assertEqual([{
+            'working_dir': project_path('app'),
+            'file': None,
+            'options': {'filter': '(?:^|\\\\)(?:BazTest|FooTest)::'},
+            'then': [{
+                'working_dir': project_path('other'),
+                'file': project_path('other', 'tests', 'OtherTest.php')
+            }]
+        }], self.runs)
+
+    def test_run_tests_runs_the_common_directory_of_their_files(self):
+        self.phpunit.run_tests(project_path('app'), ['App\\FooTest::testA', 'App\\Sub\\BarTest::testB'], [
+            project_path('app', 'tests', 'Unit', 'FooTest.php'),
+            project_path('app', 'tests', 'Unit', 'Sub', 'BarTest.php'),
+        ])
+
+        self.assertEqual([{
+            'working_dir': project_path('app'),
+            'file': project_path('app', 'tests', 'Unit'),
+            'options': {'filter': '^(?:App\\\\FooTest::testA|App\\\\Sub\\\\BarTest::testB)( with data set .+)?$'}
+        }], self.runs)
+
+    def test_run_tests_runs_the_suite_if_the_common_directory_is_not_a_test_directory(self):
+        self.phpunit.run_tests(project_path('app'), ['App\\FooTest::testA', 'Billing\\InvoiceTest::testB'], [
+            project_path('app', 'tests', 'Unit', 'FooTest.php'),
+            project_path('app', 'modules', 'Billing', 'tests', 'InvoiceTest.php'),
+        ])
+
+        self.assertEqual([{
+            'working_dir': project_path('app'),
+            'file': None,
+            'options': {'filter': '^(?:App\\\\FooTest::testA|Billing\\\\InvoiceTest::testB)( with data set .+)?$'}
+        }], self.runs)
+
+    def test_run_tests_runs_the_suite_if_their_files_are_unknown(self):
+        self.phpunit.run_tests('/code', ['FooTest::testA'], [])
+
+        self.assertEqual([{
+            'working_dir': '/code',
+            'file': None,
+            'options': {'filter': '^(?:FooTest::testA)( with data set .+)?$'}
+        }], self.runs)
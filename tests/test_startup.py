@@ -0,0 +1,53 @@
+import importlib
+import sys
+import time
+import unittest
+
+
+def is_plugin_module(name):
+    return name == 'phpunitkit.plugin' or name == 'phpunitkit.lib' or name.startswith('phpunitkit.lib.')
+
+
+class StartupTest(unittest.TestCase):
+
+    def load_plugin(self):
+        """Imports a fresh copy of the plugin, as Sublime Text does at startup."""
+        package = sys.modules['phpunitkit']
+        modules = {name: module for name, module in sys.modules.items() if is_plugin_module(name)}
+        attributes = {name: getattr(package, name) for name in ('plugin', 'lib') if hasattr(package, name)}
+
+        def restore():
+            for name in [name for name in sys.modules if is_plugin_module(name)]:
+                del sys.modules[name]
+
+            sys.modules.update(modules)
+            for name, module in attributes.items():
+                setattr(package, name, module)
+
+        self.addCleanup(restore)
+
+        for name in modules:
+            del sys.modules[name]
+
+        return importlib.import_module('phpunitkit.plugin')
+
+    def test_plugin_load_time(self):
+        start = time.time()
+        self.load_plugin()
+        elapsed = time.time() - start
+
+        # A generous bound that only catches a subsystem being imported
+        # eagerly again; loading takes a few milliseconds.
+        self.assertLess(elapsed, 1.0)
+
+    def test_subsystems_are_loaded_lazily(self):
+        plugin = self.load_plugin()
+
+        for name in ('ElementTree', 'hashlib', 'json', 'shutil', 'subprocess', 'threading'):
+            self.assertNotIn(name, vars(plugin))
+
+        for name in ('PHPUnit', 'History', 'FlakyTests', 'get_backend', 'get_coverage_driver'):
+            self.assertNotIn(name, vars(plugin))
+
+        # Only the shared helpers are loaded with the plugin.
+        self.assertEqual(['phpunitkit.lib', 'phpunitkit.lib.util'], sorted(name for name in sys.modules if name.startswith('phpunitkit.lib')))
@@ -2,6 +2,7 @@
 from phpunitkit.tests.helpers import ViewTestCase
 from phpunitkit.plugin import find_php_classes
 from phpunitkit.plugin import has_test_case
+from phpunitkit.lib.util import find_php_namespace
 
 
 class FindPHPClassesTest(ViewTestCase):
@@ -28,6 +29,17 @@ class CommandBus
         self.assertEquals(['CommandBus'], find_php_classes(self.view))
 
 
+class FindPHPNamespaceTest(ViewTestCase):
+
+    def test_find_php_namespace(self):
+        self.set_view_content('<?php\n\nnamespace App\\Tests\\Unit;\n\nuse App\\User;\n\nclass UserTest {}')
+        self.assertEquals('App\\Tests\\Unit', find_php_namespace(self.view))
+
+    def test_find_php_namespace_returns_none_without_namespace(self):
+        self.set_view_content('<?php\nclass UserTest {}')
+        self.assertIsNone(find_php_namespace(self.view))
+
+
 class HasTestCaseTest(ViewTestCase):
 
     def test_contains_phpunit_test_case_returns_true_when_view_has_test_case(self):